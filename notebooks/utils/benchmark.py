@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+import itertools
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import instrument
+from .calculate_metrics import (
+    process_data,
+    relative_errors,
+    summary_errors,
+    branch_stat,
+)
+from .ids import get_common_fluxes, get_id_table
+from .load import _get_cache, path_to_results, load_ko_data, load_sensitivity_data
+from .synthetic import write_synthetic_dataset, load_synthetic_ko_data
+from .utils import (
+    get_khodayari_kos,
+    get_kurata_kos,
+    get_millard_kos,
+    get_chassagnole_kos,
+    load_khodayari,
+    load_kurata,
+    load_millard,
+    load_chassagnole,
+)
+
+
+def _loader_cases():
+    return [
+        (
+            "Khodayari",
+            load_khodayari,
+            path_to_results / "Khodayari",
+            get_id_table("Khodayari"),
+            get_khodayari_kos(),
+        ),
+        (
+            "Kurata",
+            load_kurata,
+            path_to_results / "Kurata",
+            get_id_table("Kurata"),
+            get_kurata_kos(),
+        ),
+        (
+            "Millard",
+            load_millard,
+            path_to_results / "Millard",
+            get_id_table("Millard"),
+            get_millard_kos(),
+        ),
+        (
+            "Chassagnole",
+            load_chassagnole,
+            path_to_results / "Chassagnole" / "chemostat_knockouts",
+            get_id_table("Chassagnole"),
+            get_chassagnole_kos(),
+        ),
+    ]
+
+
+def synthetic_files(files, n_samples):
+    """
+    Creates files dictionary with n_samples synthetic perturbations,
+    each of them is mapped to one of the existing result files
+    """
+    file_names = itertools.cycle(sorted(set(files.values())))
+    return {f"synthetic_{i}": next(file_names) for i in range(n_samples)}
+
+
+def time_call(func, *args, repeat=1, **kwargs):
+    """
+    Returns the best wall time in seconds out of repeat calls,
+    messages of loaders are recorded instead of printed
+    """
+    timings = []
+    for _ in range(repeat):
+        with instrument.record():
+            start = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_loader_scaling(sample_counts=(10, 100, 1000, 3000), repeat=1):
+    """
+    Times every model loader for growing number of synthetic perturbations.
+    Loading time should grow linearly, so seconds_per_sample should stay flat.
+    Returns pd.DataFrame with columns author, n_samples, seconds, seconds_per_sample
+    """
+    rows = []
+    for author, loader, load_path, id_df, files in _loader_cases():
+        for n_samples in sample_counts:
+            seconds = time_call(
+                loader,
+                "all",
+                load_path,
+                id_df,
+                files=synthetic_files(files, n_samples),
+                repeat=repeat,
+            )
+            rows.append(
+                {
+                    "author": author,
+                    "n_samples": n_samples,
+                    "seconds": seconds,
+                    "seconds_per_sample": seconds / n_samples,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def scale_dataset(data, factor):
+    """
+    Returns tidy dataset with factor copies of every sample,
+    copies are named sample_id_1, sample_id_2, ... (first copy keeps the name)
+    """
+    copies = np.repeat(np.arange(factor), len(data))
+    sample_ids = np.tile(data["sample_id"].astype(str).values, factor)
+    scaled = pd.concat([data] * factor, ignore_index=True)
+    scaled["sample_id"] = np.where(
+        copies == 0,
+        scaled["sample_id"].values,
+        pd.Series(sample_ids).str.cat(copies.astype(str), sep="_").values,
+    )
+    return scaled
+
+
+def _chart_stages(x_rel_error, x_summary, author):
+    """
+    Chart builders of utils.vis, charts are serialized to include
+    the cost of converting data to vega-lite specification
+    """
+    # altair is only needed for this stage
+    from .vis import heatmap, jitter_summary_chart, boxplot
+
+    model = next(a for a in x_rel_error.author.values if a != author)
+    return {
+        "heatmap": lambda: heatmap(x_rel_error, author=model).to_dict(),
+        "jitter_summary_chart": lambda: jitter_summary_chart(
+            x_summary.normalized_error, author=author
+        ).to_dict(),
+        "boxplot": lambda: boxplot(x_summary.normalized_error, author=author).to_dict(),
+    }
+
+
+def benchmark_pipeline(
+    scales=(1, 10, 100),
+    author="Ishii",
+    repeat=1,
+    charts=None,
+    cache=False,
+    load_path=None,
+):
+    """
+    Times every stage of load -> process -> metrics -> chart pipeline.
+    Loading is timed on committed data and on synthetic datasets with as many
+    samples as the committed knockout data times every factor in scales
+    (see write_synthetic_dataset), the other stages on knockout data
+    scaled up by every factor in scales (see scale_dataset).
+    Synthetic datasets are written to disk for every scale and removed after
+    loading: the committed knockout data has about 33 samples, so a scale writes
+    33 * scale result files of each of 4 models (Kurata .mat files have 2101 rows).
+    Scale 10 takes about 10 s and 6 MB, the cost grows linearly, so scale 1000
+    writes about 130000 files (0.6 GB) and takes about 15 minutes to generate.
+    Returns pd.DataFrame with columns stage, scale, n_rows, seconds
+    params:
+    :scales - factors to multiply number of samples by
+    :author - reference author
+    :repeat - best of repeat calls is reported
+    :charts - time utils.vis chart builders (requires altair), by default
+      only if altair is installed
+    :cache - use cache of parsed simulation files in loading stages
+    :load_path - directory to write synthetic datasets to, temporary by default
+    """
+    has_altair = importlib.util.find_spec("altair") is not None
+    if charts is None:
+        charts = has_altair
+    elif charts and not has_altair:
+        raise ImportError("altair is required to benchmark charts")
+    rows = []
+
+    def _record(stage, scale, n_rows, func, *args, **kwargs):
+        seconds = time_call(func, *args, repeat=repeat, **kwargs)
+        rows.append(
+            {"stage": stage, "scale": scale, "n_rows": n_rows, "seconds": seconds}
+        )
+
+    _record("load_ko_data", 1, None, load_ko_data, cache=cache)
+    _record("load_sensitivity_data", 1, None, load_sensitivity_data, cache=cache)
+
+    with instrument.record():
+        data = load_ko_data(cache=cache)[0]
+    # rows which are dropped by process_data anyway are not scaled
+    data = data[data["BiGG_ID"].isin(get_common_fluxes())]
+
+    n_samples = data["sample_id"].nunique()
+    synthetic_cache = _get_cache(cache)
+    for scale in scales:
+        with tempfile.TemporaryDirectory(dir=load_path) as dataset_path:
+            # WT is added by write_synthetic_dataset
+            write_synthetic_dataset(dataset_path, n_samples * scale - 1, seed=scale)
+            n_rows = []
+            _record(
+                "load_synthetic_ko_data",
+                scale,
+                None,
+                lambda: n_rows.append(
+                    len(load_synthetic_ko_data(dataset_path, cache=synthetic_cache)[0])
+                ),
+            )
+            rows[-1]["n_rows"] = n_rows[-1]
+
+        scaled = scale_dataset(data, scale)
+        n_rows = len(scaled)
+        _record("process_data", scale, n_rows, process_data, scaled, author)
+        xdf = process_data(scaled, author)
+        _record(
+            "relative_errors",
+            scale,
+            n_rows,
+            lambda: relative_errors(xdf.copy(), author),
+        )
+        _record("summary_errors", scale, n_rows, summary_errors, xdf, author)
+        _record("branch_stat", scale, n_rows, branch_stat, xdf)
+        if charts:
+            x_rel_error = relative_errors(xdf.copy(), author)
+            x_summary = summary_errors(xdf, author)
+            for stage, build in _chart_stages(x_rel_error, x_summary, author).items():
+                _record(stage, scale, n_rows, build)
+        del scaled, xdf
+    return pd.DataFrame(rows)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from functools import lru_cache
+from pathlib import Path
+
+from . import instrument
+
+
+# Part of every cache key, bump it when the format of parsed results changes
+# in a way the source hash of the parsers (see _key_part) does not catch
+cache_version = 1
+
+
+def _file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _module_sha1(module_name):
+    source = inspect.getsource(sys.modules[module_name])
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def _key_part(part):
+    """
+    Stable text representation of a part of the cache key,
+    dataframes (e.g. ID tables) are represented by the hash of their content
+    and functions (parsers) by their name and the hash of the source of their module,
+    so results are parsed again after the parser or its helpers change
+    """
+    if callable(part) and hasattr(part, "__module__"):
+        return f"{part.__module__}.{part.__qualname__}:{_module_sha1(part.__module__)}"
+    if isinstance(part, pd.DataFrame):
+        content_hash = pd.util.hash_pandas_object(part, index=False).values
+        return hashlib.sha1(content_hash.tobytes()).hexdigest()
+    return repr(part)
+
+
+class ResultCache:
+    """
+    On-disk cache of parsed simulation results.
+    Every parsed file is stored as a separate pickle (dataframe or flux array), manifest.json keeps
+    size, modification time and sha1 of the source file for each entry.
+    Entries are reused as long as the source file is unchanged, if only mtime changed
+    the content hash is compared before parsing the file again.
+    Keys include cache_version and the source hash of the parser module, so results
+    of an older parser are never reused.
+    params:
+    :cache_dir - directory for cached dataframes, created if missing
+    """
+
+    manifest_name = "manifest.json"
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / self.manifest_name
+        # loaders running in threads (see load._run_loaders) share the manifest
+        self._lock = threading.RLock()
+        try:
+            self.manifest = json.loads(self.manifest_path.read_text())
+        except (FileNotFoundError, ValueError):
+            self.manifest = {}
+
+    def _save_manifest(self):
+        with self._lock:
+            tmp_path = self.manifest_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.manifest, indent=1, sort_keys=True))
+            os.replace(tmp_path, self.manifest_path)
+
+    def _entry(self, source, key):
+        source = Path(source).resolve()
+        entry_key = "|".join(
+            [str(source), f"v{cache_version}", pd.__version__]
+            + [_key_part(part) for part in key]
+        )
+        entry_file = (
+            self.cache_dir / f"{hashlib.sha1(entry_key.encode()).hexdigest()}.pkl"
+        )
+        return source, entry_key, entry_file
+
+    def get(self, source, key):
+        """
+        Returns cached result for the source file or None if the file was changed
+        or has never been parsed with this key
+        params:
+        :source - path to the parsed file
+        :key - tuple with everything else the result depends on (sample id, ID table, ...)
+        """
+        source, entry_key, entry_file = self._entry(source, key)
+        entry = self.manifest.get(entry_key)
+        if entry is None or not entry_file.exists():
+            return None
+
+        stat = source.stat()
+        if entry["size"] != stat.st_size:
+            return None
+        if entry["mtime"] != stat.st_mtime_ns:
+            # file was touched, check if the content is still the same
+            if entry["sha1"] != _file_sha1(source):
+                return None
+            with self._lock:
+                entry["mtime"] = stat.st_mtime_ns
+                self._save_manifest()
+        instrument.log(f"Loaded cached data for {source.name}", stage="cache")
+        return pd.read_pickle(entry_file)
+
+    def put(self, source, key, result):
+        """
+        Stores parsed result of the source file
+        """
+        source, entry_key, entry_file = self._entry(source, key)
+        stat = source.stat()
+        pd.to_pickle(result, entry_file)
+        entry = {
+            "source": str(source),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha1": _file_sha1(source),
+        }
+        with self._lock:
+            self.manifest[entry_key] = entry
+            self._save_manifest()
+
+    def load(self, source, key, parse):
+        """
+        Returns cached result for the source file, calls parse() if the file
+        was changed or has never been parsed with this key
+        params:
+        :source - path to the parsed file
+        :key - tuple with everything else the result depends on (sample id, ID table, ...)
+        :parse - function without arguments returning the parsed result
+        """
+        result = self.get(source, key)
+        if result is None:
+            result = parse()
+            self.put(source, key, result)
+        return result
+
+    def clear(self):
+        """
+        Removes all cached results
+        """
+        with self._lock:
+            for entry_file in self.cache_dir.glob("*.pkl"):
+                entry_file.unlink()
+            self.manifest = {}
+            self._save_manifest()
@@ -1,37 +1,23 @@
+import hashlib
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import xarray as xr
 
 
-from pathlib import Path
-
-# from .load import _load_experimental_ko_data
-
-
-# Set up paths
-data_path = Path("../data")
-path_to_results = data_path / "simulation_results"
-
-# Load ID dataframes
-khod_idf = pd.read_csv(data_path / "khodayari_id.csv")
-millard_idf = pd.read_csv(data_path / "millard_id.csv")
-kurata_idf = pd.read_csv(data_path / "kurata_id.csv")
-chassagnole_idf = pd.read_csv(data_path / "chassagnole_id.csv")
+from . import instrument
+from .ids import get_common_fluxes
 
 
 def _get_common_fluxes(data, author, include_chassagnole=False):
     """
     Find such fluxes that are common between all datasets
     """
-    common_fluxes = set(khod_idf["BiGG ID"].unique()).intersection(
-        set(millard_idf["BiGG ID"].unique()),
-        set(kurata_idf["BiGG ID"].unique()),
-        set(data.query("author == @author").BiGG_ID.unique()),
+    return get_common_fluxes(include_chassagnole).intersection(
+        data.loc[data["author"] == author, "BiGG_ID"].unique()
     )
-    if include_chassagnole:
-        common_fluxes = common_fluxes.intersection(chassagnole_idf["BiGG ID"].unique())
-    common_fluxes = {x for x in common_fluxes if pd.notna(x)}
-    return common_fluxes
 
 
 def _get_branch_points():
@@ -56,132 +42,588 @@ def _get_branch_points():
     ]
 
 
+def _group_median(codes, n_groups, values):
+    """
+    Median of values for every group code ignoring NaNs, NaN for empty groups
+    """
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    non_empty = counts > 0
+    lower = starts[non_empty] + (counts[non_empty] - 1) // 2
+    upper = starts[non_empty] + counts[non_empty] // 2
+
+    median = np.full(n_groups, np.nan)
+    median[non_empty] = (values[lower] + values[upper]) / 2
+    return median
+
+
+_dims = ["sample_id", "author", "BiGG_ID"]
+
+
+def _dense_fluxes(selected_data, reactions=None):
+    """
+    Aggregates tidy fluxes by median into dense (sample_id, author, BiGG_ID) arrays,
+    trims small normalized fluxes and fills unpredicted Chassagnole fluxes.
+    Returns coordinates and dict column -> array.
+    params:
+    :selected_data - tidy dataframe with the selected reactions
+    :reactions - sorted BiGG IDs to use as coordinates, by default the ones in data
+    """
+    codes, coords = [], {}
+    for dim in _dims:
+        if dim == "BiGG_ID" and reactions is not None:
+            coords[dim] = pd.Index(reactions)
+            dim_codes = coords[dim].get_indexer(selected_data[dim])
+        else:
+            dim_codes, coords[dim] = pd.factorize(selected_data[dim], sort=True)
+        codes.append(dim_codes)
+    # rows with missing labels are dropped as in groupby
+    labelled = np.all([dim_codes >= 0 for dim_codes in codes], axis=0)
+    shape = tuple(len(coords[dim]) for dim in _dims)
+    group = np.ravel_multi_index([dim_codes[labelled] for dim_codes in codes], shape)
+
+    values = selected_data.drop(columns=_dims).select_dtypes("number")
+    arrays = {
+        column: _group_median(
+            group, np.prod(shape, dtype=int), values[column].values[labelled]
+        ).reshape(shape)
+        for column in values
+    }
+    flux, normalized_flux = arrays["flux"], arrays["normalized_flux"]
+
+    # trim extremely small values
+    normalized_flux[~(abs(normalized_flux) > 1e-1)] = 0.0
+    normalized_flux[np.isnan(flux)] = np.NaN
+
+    # each unpredicted flux is set to zero
+    if "Chassagnole" in coords["author"]:
+        chassagnole = coords["author"].get_loc("Chassagnole")
+        # find sample ids where not all fluxes are NaNs
+        predicted = ~np.isnan(flux[:, chassagnole]).all(axis=1)
+        for array in (flux, normalized_flux):
+            array[predicted, chassagnole] = np.nan_to_num(
+                array[predicted, chassagnole], nan=0.0
+            )
+    return coords, arrays
+
+
+@instrument.timed("process_data")
 def process_data(data, author, trim_tca=True):
     """ 
     Subselect and check if the data is alright. Fixes some issues which can lead to numerical troubles.
+    Duplicated reactions are aggregated by median into dense
+    (sample_id, author, BiGG_ID) arrays.
     """
     if trim_tca:
         selected_fluxes = _get_common_fluxes(data, author)
     else:
         selected_fluxes = _get_common_fluxes(data, author, include_chassagnole=True)
-    
-    selected_data = (
-        data.query("BiGG_ID in @selected_fluxes")
-        .groupby(["BiGG_ID", "sample_id", "author"])
-        .median()
-        .reset_index()
-    )
-    xdf = selected_data.set_index(["sample_id", "author", "BiGG_ID"]).to_xarray()
 
-    abs_flux = xdf.flux
-    # trim extremely small values
-    xdf["normalized_flux"] = xdf.normalized_flux.where(
-        abs(xdf.normalized_flux) > 1e-1, 0.0
+    coords, arrays = _dense_fluxes(data[data["BiGG_ID"].isin(selected_fluxes)])
+    return xr.Dataset(
+        {column: (_dims, array) for column, array in arrays.items()},
+        coords={dim: np.asarray(coords[dim], dtype=object) for dim in _dims},
     )
-    xdf["normalized_flux"] = xdf.normalized_flux.where(~abs_flux.isnull(), np.NaN)
 
-    # each unpredicted flux is set to zero
-    if "Chassagnole" in xdf.author:
-        chassagnole = xdf.sel(dict(author="Chassagnole"))
-        # find sample ids where not all fluxes are NaNs
-        ch = chassagnole.groupby("sample_id").apply(lambda x: x.flux.isnull().all())
-        xdf["flux"].loc[
-            dict(author="Chassagnole", sample_id=ch.where(~ch, drop=True).sample_id)
-        ] = (
-            xdf["flux"]
-            .loc[
-                dict(author="Chassagnole", sample_id=ch.where(~ch, drop=True).sample_id)
-            ]
-            .fillna(0.0)
-        )
-        xdf["normalized_flux"].loc[
-            dict(author="Chassagnole", sample_id=ch.where(~ch, drop=True).sample_id)
-        ] = (
-            xdf["normalized_flux"]
-            .loc[
-                dict(author="Chassagnole", sample_id=ch.where(~ch, drop=True).sample_id)
-            ]
-            .fillna(0.0)
-        )
-
-    return xdf
 
-
-def relative_errors(xdf, author=None):
+def _error_kernel(nm_flux, exp_flux, missing, summary_only=False):
     """
-    Calculates error metrics. Supposed to be run after process_data
+    Computes all error metrics in one pass over (sample, author, reaction) arrays,
+    intermediate results are written into the output buffers instead of new arrays.
+    params:
+    :nm_flux - normalized fluxes of all authors
+    :exp_flux - normalized fluxes of the reference author, (sample, 1, reaction)
+    :missing - boolean mask of fluxes which were not predicted
+    :summary_only - return only unnormalized and normalized errors, per reaction
+      errors are not computed
     """
-    abs_flux = xdf.flux
+    abs_diff = np.subtract(nm_flux, exp_flux)
+    np.abs(abs_diff, out=abs_diff)
+    abs_exp = np.abs(exp_flux)
 
-    nm_flux = xdf.normalized_flux
-    exp_flux = xdf.sel(author=author).normalized_flux
+    # L2 norms over reactions, same reduction as np.linalg.norm
+    symm_relative_error = np.multiply(abs_diff, abs_diff)
+    unnormalized_error = np.sqrt(np.add.reduce(symm_relative_error, axis=-1))
+    exp_norm = np.sqrt(np.add.reduce(abs_exp * abs_exp, axis=-1))
+    normalized_error = np.divide(unnormalized_error, exp_norm)
+    if summary_only:
+        return unnormalized_error, normalized_error
 
     # Mean absolute percent error (MAPE)
-    xdf["relative_error"] = abs(nm_flux - exp_flux) / abs(exp_flux) * 100
+    relative_error = np.divide(abs_diff, abs_exp)
+    relative_error *= 100
+    nm_zero = np.equal(nm_flux, 0)
+    exp_zero = exp_flux == 0
     # If either predicted OR original are zeros then error is 100%
-    xdf["relative_error"] = xdf["relative_error"].where(
-        ((nm_flux != 0) & (exp_flux != 0)), 100
-    )
+    relative_error[nm_zero | exp_zero] = 100
     # If original data and predicted data were both zeros then error is zero as well
-    xdf["relative_error"] = xdf["relative_error"].where(
-        ~((nm_flux == 0) & (exp_flux == 0)), 0
-    )
+    np.logical_and(nm_zero, exp_zero, out=nm_zero)
+    relative_error[nm_zero] = 0
     # Put back NaNs where they were originally
-    xdf["relative_error"] = xdf["relative_error"].where(~abs_flux.isnull(), np.NaN)
+    relative_error[missing] = np.NaN
 
     # Calculate symmetric MAPE
-    xdf["symm_relative_error"] = (
-        100 * abs(nm_flux - exp_flux) / ((abs(nm_flux) + abs(exp_flux)) / 2)
+    np.abs(nm_flux, out=symm_relative_error)
+    symm_relative_error += abs_exp
+    symm_relative_error /= 2
+    abs_diff *= 100
+    np.divide(abs_diff, symm_relative_error, out=symm_relative_error)
+
+    return relative_error, symm_relative_error, unnormalized_error, normalized_error
+
+
+@instrument.timed("error_metrics")
+def error_metrics(xdf, author=None):
+    """
+    Calculates relative errors (see relative_errors) and summary errors
+    (see summary_errors) at once. Supposed to be run after process_data.
+    Returns tuple of xdf with added relative errors and summary DataSet
+    """
+    dims = ("sample_id", "author", "BiGG_ID")
+    nm_flux = xdf.normalized_flux.transpose(*dims)
+    exp_flux = nm_flux.values[:, [nm_flux.indexes["author"].get_loc(author)], :]
+    missing = xdf.flux.transpose(*dims).isnull().values
+
+    relative_error, symm_relative_error, unnormalized_error, normalized_error = (
+        _error_kernel(nm_flux.values, exp_flux, missing)
     )
-    return xdf
+    coords = {dim: nm_flux[dim] for dim in dims}
+    xdf["relative_error"] = xr.DataArray(relative_error, coords=coords, dims=dims)
+    xdf["symm_relative_error"] = xr.DataArray(
+        symm_relative_error, coords=coords, dims=dims
+    )
+
+    return xdf, _summary_dataset(nm_flux, unnormalized_error, normalized_error)
+
+
+def _summary_dataset(nm_flux, unnormalized_error, normalized_error):
+    dims = nm_flux.dims[:2]
+    return xr.Dataset(
+        data_vars={
+            "normalized_error": (dims, normalized_error),
+            "unnormalized_error": (dims, unnormalized_error),
+        },
+        coords={dim: nm_flux[dim] for dim in dims},
+    )
+
+
+@instrument.timed("relative_errors")
+def relative_errors(xdf, author=None):
+    """
+    Calculates error metrics. Supposed to be run after process_data
+    """
+    return error_metrics(xdf, author)[0]
 
 
+@instrument.timed("summary_errors")
 def summary_errors(xdata, author=None):
     """
     Calculates summary error per each sample_id for each model. Supposed to be run after check_data.
     Returns xarray DataSet with both normalized and non-normalized error.
     Normalized error is L2norm(pred-exp) divided by L2Norm(exp)
     """
+    dims = ("sample_id", "author", "BiGG_ID")
+    nm_flux = xdata.normalized_flux.transpose(*dims)
+    exp_flux = nm_flux.values[:, [nm_flux.indexes["author"].get_loc(author)], :]
+    unnormalized_error, normalized_error = _error_kernel(
+        nm_flux.values, exp_flux, None, summary_only=True
+    )
+    return _summary_dataset(nm_flux, unnormalized_error, normalized_error)
+
+
+def _bootstrap_chunk(nm_flux, exp_flux, exp_error, n_replicates, seed):
+    """
+    Draws n_replicates reference vectors from normal distributions given by
+    exp_flux and exp_error (sample, reaction) and returns unnormalized and
+    normalized L2 errors of nm_flux (sample, author, reaction) as
+    (replicate, sample, author) arrays
+    """
+    rng = np.random.default_rng(seed)
+    replicates = rng.standard_normal((n_replicates,) + exp_flux.shape)
+    replicates *= exp_error
+    replicates += exp_flux
+    # trim extremely small values as process_data does
+    replicates[~(abs(replicates) > 1e-1)] = 0.0
+    replicates[:, np.isnan(exp_flux)] = np.NaN
+
+    # |nm - exp|^2 = |nm|^2 - 2 nm.exp + |exp|^2, without (replicate, sample,
+    # author, reaction) intermediate array
+    nm_norm = np.einsum("sar,sar->sa", nm_flux, nm_flux)
+    cross = np.einsum("sar,bsr->bsa", nm_flux, replicates)
+    exp_norm = np.einsum("bsr,bsr->bs", replicates, replicates)[..., None]
+    unnormalized_error = np.sqrt(np.maximum(nm_norm - 2 * cross + exp_norm, 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized_error = unnormalized_error / np.sqrt(exp_norm)
+    return unnormalized_error, normalized_error
+
+
+@instrument.timed("bootstrap_summary_errors")
+def bootstrap_summary_errors(
+    xdf,
+    author=None,
+    n_replicates=1000,
+    quantiles=(0.025, 0.5, 0.975),
+    error="normalized_flux_error",
+    seed=None,
+    workers=None,
+    chunk_size=250,
+    interval="centered",
+):
+    """
+    Confidence intervals of summary_errors from resampling the reference fluxes
+    within their reported error (normal distribution with the error as standard
+    deviation, fluxes without reported error are kept fixed).
+    The noise only increases the distance between the fluxes on average,
+    so the resampled errors are biased upwards and their quantiles usually
+    exclude summary_errors. The centered interval keeps the spread of the
+    resampled errors, but moves their median to summary_errors (quantile q is
+    error + quantile q - median of the replicates), so it always contains the
+    estimate and its lower bound can be below zero for errors close to zero.
+    The percentile interval is the distribution of errors under the measurement
+    noise as it is, not an interval of summary_errors.
+    Supposed to be run after process_data.
+    Returns xarray DataSet with quantiles of normalized and non-normalized error
+    and the summary_errors they belong to (normalized_error_estimate and
+    unnormalized_error_estimate), interval is kept in attrs.
+    params:
+    :xdf - output of process_data
+    :author - reference author, e.g. Ishii
+    :n_replicates - number of resampled reference vectors
+    :quantiles - quantiles of errors to return
+    :error - data variable with the error of normalized_flux of the reference author
+    :seed - seed of the random generator, results do not depend on workers
+    :workers - number of processes (or Executor) to split replicates between,
+      None to compute them in the current process
+    :chunk_size - number of replicates drawn at once
+    :interval - centered for median bias corrected intervals around
+      summary_errors, percentile for quantiles of the resampled errors
+    """
+    if error not in xdf:
+        raise ValueError(
+            f"{error} is not present, load data with load_ko_data(errors=True)"
+        )
+    if interval not in ("centered", "percentile"):
+        raise ValueError(f"Unknown interval {interval}, use centered or percentile")
+    dims = ("sample_id", "author", "BiGG_ID")
+    nm_flux = xdf.normalized_flux.transpose(*dims).values
+    reference = xdf.sel(author=author).transpose(*dims[::2])
+    exp_flux = reference.normalized_flux.values
+    exp_error = np.nan_to_num(reference[error].values, nan=0.0)
 
-    def vector_norm(x, dim, ord=None):
-        return xr.apply_ufunc(
-            np.linalg.norm, x, input_core_dims=[[dim]], kwargs={"ord": ord, "axis": -1}
+    chunks = [
+        min(chunk_size, n_replicates - start)
+        for start in range(0, n_replicates, chunk_size)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = [(nm_flux, exp_flux, exp_error, n, s) for n, s in zip(chunks, seeds)]
+
+    if workers is None:
+        results = [_bootstrap_chunk(*arg) for arg in args]
+    else:
+        if isinstance(workers, Executor):
+            pool = workers
+        else:
+            pool = ProcessPoolExecutor(workers)
+        try:
+            results = list(pool.map(_bootstrap_chunk, *zip(*args)))
+        finally:
+            if pool is not workers:
+                pool.shutdown()
+
+    coords = {
+        "quantile": list(quantiles),
+        "sample_id": xdf["sample_id"].values,
+        "author": xdf["author"].values,
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimates = _error_kernel(nm_flux, exp_flux[:, None, :], None, True)
+    data_vars = {}
+    for i, name in [(1, "normalized_error"), (0, "unnormalized_error")]:
+        replicates = np.concatenate([result[i] for result in results])
+        values = np.quantile(replicates, quantiles, axis=0)
+        if interval == "centered":
+            values += estimates[i] - np.median(replicates, axis=0)
+        data_vars[name] = (("quantile", "sample_id", "author"), values)
+        data_vars[f"{name}_estimate"] = (("sample_id", "author"), estimates[i])
+    return xr.Dataset(data_vars, coords=coords, attrs={"interval": interval})
+
+
+def get_model_branch_points(model, reactions=None):
+    """
+    Generates branch points from stoichiometry of a COBRA model (e.g. iML1515),
+    every pair of reactions consuming the same metabolite is a branch point.
+    params:
+    :model - cobra.Model
+    :reactions - collection of reaction IDs to consider (e.g. common BiGG IDs),
+      all reactions of the model by default
+    """
+    branch_points = []
+    for metabolite in model.metabolites:
+        consuming = sorted(
+            reaction.id
+            for reaction in metabolite.reactions
+            if reaction.get_coefficient(metabolite) < 0
+            and (reactions is None or reaction.id in reactions)
         )
+        for i, one in enumerate(consuming):
+            for two in consuming[i + 1 :]:
+                branch_points.append(
+                    {"name": f"{metabolite.id}_{one}_{two}", "one": one, "two": two}
+                )
+    return branch_points
 
-    xdf = xdata
-    nm_flux = xdf.normalized_flux
-    exp_flux = xdf.sel(author=author).normalized_flux
 
-    diff_norm = vector_norm(nm_flux - exp_flux, dim="BiGG_ID", ord=2)
-    ishii_norm = vector_norm(exp_flux, dim="BiGG_ID", ord=2)
-    x_norm_error = (
-        (diff_norm / ishii_norm)
-        .rename("normalized_error")
-        .where(~diff_norm.isnull(), np.NaN)
+def branch_missing(xdf, branch_points=None):
+    """
+    Returns pd.DataFrame indexed by branch name with boolean columns one and two
+    marking branch reactions which are not present in xdf
+    params:
+    :xdf - output of process_data
+    :branch_points - list of dicts with name, one and two, see _get_branch_points
+    """
+    if branch_points is None:
+        branch_points = _get_branch_points()
+    reactions = xdf.indexes["BiGG_ID"]
+    return pd.DataFrame(
+        {
+            "one": reactions.get_indexer([b["one"] for b in branch_points]) < 0,
+            "two": reactions.get_indexer([b["two"] for b in branch_points]) < 0,
+        },
+        index=pd.Index([b["name"] for b in branch_points], name="Branch"),
     )
-    diff_norm = diff_norm.rename("unnormalized_error")
 
-    return xr.Dataset(
-        data_vars={"normalized_error": x_norm_error, "unnormalized_error": diff_norm}
+
+@instrument.timed("branch_stat")
+def branch_stat(xdf, branch_points=None, drop_missing=True):
+    """
+    Calculates split ratio one / (one + two) of normalized fluxes for every
+    branch point at once. Supposed to be called after processing.
+    params:
+    :xdf - output of process_data
+    :branch_points - list of dicts with name, one and two, see _get_branch_points
+    :drop_missing - drop branches with missing reactions (see branch_missing),
+      otherwise they are kept as NaNs
+    """
+    if branch_points is None:
+        branch_points = _get_branch_points()
+    missing = branch_missing(xdf, branch_points)
+    if drop_missing:
+        branch_points = [b for b, m in zip(branch_points, missing.any(axis=1)) if not m]
+
+    normalized_flux = xdf.normalized_flux.transpose(..., "BiGG_ID")
+    # append NaN column which is gathered for missing reactions
+    values = np.concatenate(
+        [normalized_flux.values, np.full(normalized_flux.shape[:-1] + (1,), np.nan)],
+        axis=-1,
     )
+    reactions = normalized_flux.indexes["BiGG_ID"]
+    one = values[..., reactions.get_indexer([b["one"] for b in branch_points])]
+    two = values[..., reactions.get_indexer([b["two"] for b in branch_points])]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        calc = one / (one + two)
 
+    dims = normalized_flux.dims[:-1]
+    return xr.DataArray(
+        np.moveaxis(calc, -1, 0),
+        coords=dict(
+            {dim: normalized_flux[dim] for dim in dims},
+            Branch=[b["name"] for b in branch_points],
+        ),
+        dims=("Branch",) + dims,
+        name="percentage",
+    )
 
-def branch_stat(xdf):
-    # Supposed to be called after processing
-    branch_list = []
-    for branch in _get_branch_points():
-        try:
-            one = xdf.sel(BiGG_ID=branch["one"]).normalized_flux
-            two = xdf.sel(BiGG_ID=branch["two"]).normalized_flux
-            calc = one / (one + two)
-            calc = (
-                calc.assign_coords(Branch=branch["name"])
-                .drop("BiGG_ID")
-                .rename("percentage")
+
+class MetricsStore:
+    """
+    Keeps processed fluxes and metrics for every (author, sample_id) and recomputes
+    only the parts affected by new data. Changing fluxes of a model sample recomputes
+    its own metrics, changing reference fluxes of a sample recomputes metrics
+    of all authors for that sample, and a change of reactions measured by
+    the reference author recomputes everything.
+    params:
+    :author - reference author, e.g. Ishii
+    :trim_tca - see process_data
+    """
+
+    def __init__(self, author, trim_tca=True):
+        self.author = author
+        self.trim_tca = trim_tca
+        self.reactions = []
+        self._rows = {}
+        self._hashes = {}
+        self._fluxes = {}
+        self._errors = {}
+        self._branches = {}
+
+    @staticmethod
+    def _hash(df):
+        columns = df.columns.difference(["author", "sample_id"], sort=False)
+        content_hash = pd.util.hash_pandas_object(df[columns], index=False).values
+        return hashlib.sha1(content_hash.tobytes()).hexdigest()
+
+    def _get_reactions(self):
+        reference_ids = {
+            bigg_id
+            for (author, _), rows in self._rows.items()
+            if author == self.author
+            for bigg_id in rows["BiGG_ID"].unique()
+        }
+        common_fluxes = get_common_fluxes(include_chassagnole=not self.trim_tca)
+        return sorted(common_fluxes.intersection(reference_ids))
+
+    def update(self, data):
+        """
+        Adds new or re-simulated samples, data is a tidy dataframe as returned by
+        utils.load which can contain only the changed (author, sample_id) pairs.
+        Returns set of (author, sample_id) pairs whose metrics were recomputed
+        """
+        changed = set()
+        for key, rows in data.groupby(["author", "sample_id"], sort=False):
+            content_hash = self._hash(rows)
+            if self._hashes.get(key) != content_hash:
+                self._hashes[key] = content_hash
+                self._rows[key] = rows
+                changed.add(key)
+
+        reactions = self._get_reactions()
+        if reactions != self.reactions:
+            self.reactions = reactions
+            changed = set(self._rows)
+        if not changed:
+            return changed
+
+        self._process(changed)
+        # metrics of every author depend on the reference fluxes of the sample
+        reference_samples = {
+            sample_id for author, sample_id in changed if author == self.author
+        }
+        outdated = changed | {
+            key for key in self._fluxes if key[1] in reference_samples
+        }
+        self._compute_errors(outdated)
+        return outdated
+
+    def _process(self, keys):
+        rows = pd.concat([self._rows[key] for key in keys], sort=False)
+        rows = rows[rows["BiGG_ID"].isin(self.reactions)]
+        coords, arrays = _dense_fluxes(rows, self.reactions)
+        samples = coords["sample_id"].get_indexer([key[1] for key in keys])
+        authors = coords["author"].get_indexer([key[0] for key in keys])
+
+        reaction_index = {bigg_id: i for i, bigg_id in enumerate(self.reactions)}
+        for key, sample, author in zip(keys, samples, authors):
+            if sample < 0 or author < 0:
+                # none of the selected reactions were simulated
+                flux = normalized_flux = np.full(len(self.reactions), np.nan)
+            else:
+                flux = arrays["flux"][sample, author]
+                normalized_flux = arrays["normalized_flux"][sample, author]
+            self._fluxes[key] = (flux, normalized_flux)
+
+            branches = []
+            for branch in _get_branch_points():
+                if branch["one"] in reaction_index and branch["two"] in reaction_index:
+                    one = normalized_flux[reaction_index[branch["one"]]]
+                    two = normalized_flux[reaction_index[branch["two"]]]
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        branches.append(one / (one + two))
+            self._branches[key] = np.array(branches)
+
+    def _compute_errors(self, keys):
+        keys = list(keys)
+        missing_reference = np.full(len(self.reactions), np.nan)
+        flux = np.stack([self._fluxes[key][0] for key in keys])[:, None, :]
+        nm_flux = np.stack([self._fluxes[key][1] for key in keys])[:, None, :]
+        exp_flux = np.stack(
+            [
+                self._fluxes.get((self.author, key[1]), (None, missing_reference))[1]
+                for key in keys
+            ]
+        )[:, None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            errors = _error_kernel(nm_flux, exp_flux, np.isnan(flux))
+        for i, key in enumerate(keys):
+            self._errors[key] = tuple(error[i, 0] for error in errors)
+
+    def _coords(self):
+        keys = list(self._fluxes)
+        author_codes, authors = pd.factorize([key[0] for key in keys], sort=True)
+        sample_codes, samples = pd.factorize(
+            pd.Series([key[1] for key in keys], dtype=object), sort=True
+        )
+        coords = {
+            "sample_id": np.asarray(samples, dtype=object),
+            "author": np.asarray(authors, dtype=object),
+        }
+        return keys, sample_codes, author_codes, coords
+
+    def _dense(self, values, size):
+        keys, sample_codes, author_codes, coords = self._coords()
+        shape = (len(coords["sample_id"]), len(coords["author"])) + size
+        array = np.full(shape, np.nan)
+        for key, sample, author in zip(keys, sample_codes, author_codes):
+            array[sample, author] = values[key]
+        return array, coords
+
+    def processed(self):
+        """
+        Returns the same Dataset as process_data for all stored samples
+        """
+        data_vars = {}
+        for i, column in enumerate(["flux", "normalized_flux"]):
+            array, coords = self._dense(
+                {key: value[i] for key, value in self._fluxes.items()},
+                (len(self.reactions),),
+            )
+            data_vars[column] = (_dims, array)
+        coords["BiGG_ID"] = np.asarray(self.reactions, dtype=object)
+        return xr.Dataset(data_vars, coords=coords)
+
+    def relative_errors(self):
+        """
+        Returns the same Dataset as relative_errors(process_data(...))
+        """
+        xdf = self.processed()
+        for i, column in enumerate(["relative_error", "symm_relative_error"]):
+            array, _ = self._dense(
+                {key: value[i] for key, value in self._errors.items()},
+                (len(self.reactions),),
             )
-            branch_list.append(calc)
-        except KeyError:
-            print(f"No data for branch point {branch['name']}")
+            xdf[column] = (_dims, array)
+        return xdf
 
-    return xr.concat(branch_list, dim="Branch")
+    def summary_errors(self):
+        """
+        Returns the same Dataset as summary_errors(process_data(...))
+        """
+        data_vars = {}
+        for i, column in [(3, "normalized_error"), (2, "unnormalized_error")]:
+            array, coords = self._dense(
+                {key: value[i] for key, value in self._errors.items()}, ()
+            )
+            data_vars[column] = (_dims[:2], array)
+        return xr.Dataset(data_vars, coords=coords)
 
+    def branch_stat(self):
+        """
+        Returns the same DataArray as branch_stat(process_data(...))
+        """
+        names = [
+            branch["name"]
+            for branch in _get_branch_points()
+            if branch["one"] in self.reactions and branch["two"] in self.reactions
+        ]
+        array, coords = self._dense(self._branches, (len(names),))
+        coords["Branch"] = names
+        return xr.DataArray(
+            np.moveaxis(array, -1, 0),
+            coords=coords,
+            dims=["Branch"] + _dims[:2],
+            name="percentage",
+        )
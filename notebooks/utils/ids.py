@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+
+# data folder of the repository, independent of the working directory
+data_path = Path(__file__).resolve().parents[2] / "data"
+
+_id_files = {
+    "Khodayari": "khodayari_id.csv",
+    "Millard": "millard_id.csv",
+    "Kurata": "kurata_id.csv",
+    "Chassagnole": "chassagnole_id.csv",
+}
+
+# models which are always compared, Chassagnole model lacks TCA cycle
+_common_authors = ("Khodayari", "Millard", "Kurata")
+
+
+@lru_cache(maxsize=None)
+def get_id_table(author):
+    """
+    Returns pd.DataFrame with conversion Model ID -> BiGG ID for the model.
+    Every table is read only once per session and shared, do not modify it in place.
+    params:
+    :author - Khodayari, Millard, Kurata or Chassagnole
+    """
+    if author not in _id_files:
+        raise ValueError(f"Unknown model {author}")
+    return pd.read_csv(data_path / _id_files[author])
+
+
+@lru_cache(maxsize=None)
+def get_bigg_ids(author):
+    """
+    Returns frozenset of BiGG IDs covered by the model
+    """
+    bigg_ids = get_id_table(author)["BiGG ID"]
+    return frozenset(bigg_ids[bigg_ids.notna()].unique())
+
+
+@lru_cache(maxsize=None)
+def get_common_fluxes(include_chassagnole=False):
+    """
+    Returns frozenset of BiGG IDs covered by all the models
+    """
+    authors = _common_authors + (("Chassagnole",) if include_chassagnole else ())
+    return frozenset.intersection(*[get_bigg_ids(author) for author in authors])
+
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from contextlib import contextmanager
+
+
+# reports which are currently recording and the stack of open spans,
+# kept per context so threads do not record into each other's spans
+_reports = contextvars.ContextVar("reports", default=())
+_spans = contextvars.ContextVar("spans", default=())
+
+
+class RunReport:
+    """
+    Collects events of instrumented loaders and metric functions.
+    Every event has stage, name, sample_id, start (unix time), seconds,
+    bytes_read, rows, peak_memory (bytes above the memory at the start of the stage,
+    only if memory=True), pid, depth (nesting level) and message.
+    params:
+    :memory - trace peak memory of every stage with tracemalloc, slows Python down.
+      tracemalloc traces the whole process and spans reset its peak, so memory
+      is traced only in the main thread of a process (threaded loaders run one
+      by one, worker processes trace their own memory)
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.events = []
+
+    def to_frame(self):
+        """
+        Returns pd.DataFrame with one row per event
+        """
+        columns = [
+            "stage",
+            "name",
+            "sample_id",
+            "start",
+            "seconds",
+            "bytes_read",
+            "rows",
+            "peak_memory",
+            "pid",
+            "depth",
+            "message",
+        ]
+        return pd.DataFrame(self.events, columns=columns)
+
+    def summary(self):
+        """
+        Returns total and mean time, bytes, rows and maximum peak memory per stage
+        """
+        df = self.to_frame()
+        df = df[df["seconds"].notna()]
+        return df.groupby("stage").agg(
+            calls=("seconds", "size"),
+            seconds=("seconds", "sum"),
+            mean_seconds=("seconds", "mean"),
+            bytes_read=("bytes_read", "sum"),
+            rows=("rows", "sum"),
+            peak_memory=("peak_memory", "max"),
+        )
+
+    def text(self):
+        """
+        Returns messages of all events, one per line
+        """
+        return "".join(
+            f"{event['message']}\n" for event in self.events if event.get("message")
+        )
+
+    def to_chrome_trace(self, path=None):
+        """
+        Returns events in Chrome Trace Event format (chrome://tracing, Perfetto),
+        writes them as json if path is given
+        """
+        trace = []
+        for event in self.events:
+            args = {
+                key: value
+                for key, value in event.items()
+                if key not in ("stage", "name", "start", "seconds", "pid")
+                and value is not None
+            }
+            if event["seconds"] is None:
+                trace.append(
+                    {
+                        "name": event["message"],
+                        "cat": event["stage"],
+                        "ph": "i",
+                        "s": "p",
+                        "ts": event["start"] * 1e6,
+                        "pid": event["pid"],
+                        "tid": 0,
+                    }
+                )
+                continue
+            trace.append(
+                {
+                    "name": event["name"] or event["stage"],
+                    "cat": event["stage"],
+                    "ph": "X",
+                    "ts": event["start"] * 1e6,
+                    "dur": event["seconds"] * 1e6,
+                    "pid": event["pid"],
+                    "tid": 0,
+                    "args": args,
+                }
+            )
+        trace = {"traceEvents": trace}
+        if path is not None:
+            with open(path, "w") as fh:
+                json.dump(trace, fh)
+        return trace
+
+
+def _emit(event):
+    for report in _reports.get():
+        report.events.append(event)
+
+
+def _memory():
+    return any(report.memory for report in _reports.get())
+
+
+@contextmanager
+def record(report=None):
+    """
+    Records events of everything run inside the context into report
+    (new RunReport by default) and returns it.
+    Messages of loaders are recorded instead of printed while recording.
+    """
+    report = report or RunReport()
+    if report.memory and threading.current_thread() is not threading.main_thread():
+        raise ValueError("Memory can be traced only in the main thread")
+    started_tracing = report.memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _reports.set(_reports.get() + (report,))
+    try:
+        yield report
+    finally:
+        _reports.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def span(stage, name=None, sample_id=None, bytes_read=None):
+    """
+    Times the code inside the context as one event of the stage.
+    Yields dict of event fields which can be updated by the code (see annotate).
+    Does nothing if no report is recording.
+    """
+    if not _reports.get():
+        yield {}
+        return
+
+    spans = _spans.get()
+    memory = _memory() and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if spans:
+            spans[-1]["_peak"] = max(spans[-1]["_peak"], peak)
+        tracemalloc.reset_peak()
+    event = {
+        "stage": stage,
+        "name": name,
+        "sample_id": sample_id,
+        "bytes_read": bytes_read,
+        "rows": None,
+        "peak_memory": None,
+        "message": None,
+        "pid": os.getpid(),
+        "depth": len(spans),
+        "_peak": current if memory else 0,
+        "_start_memory": current if memory else 0,
+    }
+    token = _spans.set(spans + (event,))
+    event["start"] = time.time()
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event["seconds"] = time.perf_counter() - start
+        _spans.reset(token)
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            event["_peak"] = max(event["_peak"], peak)
+            event["peak_memory"] = event["_peak"] - event["_start_memory"]
+            if spans:
+                spans[-1]["_peak"] = max(spans[-1]["_peak"], event["_peak"])
+        del event["_peak"], event["_start_memory"]
+        _emit(event)
+
+
+def annotate(**fields):
+    """
+    Sets fields (rows, bytes_read, message, ...) of the innermost open span
+    """
+    spans = _spans.get()
+    if spans:
+        spans[-1].update(fields)
+
+
+def count_bytes(n):
+    """
+    Adds n bytes read from disk to bytes_read of the innermost open span
+    """
+    spans = _spans.get()
+    if spans:
+        spans[-1]["bytes_read"] = (spans[-1]["bytes_read"] or 0) + n
+
+
+def log(message, stage="message"):
+    """
+    Records message while recording, otherwise prints it
+    """
+    if not _reports.get():
+        print(message)
+        return
+    _emit(
+        {
+            "stage": stage,
+            "name": None,
+            "sample_id": None,
+            "start": time.time(),
+            "seconds": None,
+            "bytes_read": None,
+            "rows": None,
+            "peak_memory": None,
+            "pid": os.getpid(),
+            "depth": len(_spans.get()),
+            "message": message,
+        }
+    )
+
+
+def _count_rows(result):
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if hasattr(result, "sizes"):
+        # xarray objects, number of elements of the data
+        return int(np.prod(list(result.sizes.values()), dtype=np.int64))
+    return None
+
+
+def timed(stage):
+    """
+    Decorator recording every call of the function as a span of the stage,
+    rows is the length of the returned dataframe or size of xarray result
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _reports.get():
+                return func(*args, **kwargs)
+            with span(stage) as event:
+                result = func(*args, **kwargs)
+                event["rows"] = _count_rows(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def run_recorded(func, args, memory=False):
+    """
+    Calls func(*args) while recording into a new report,
+    returns the result and the recorded events (used in worker processes and threads),
+    memory is not traced in threads other than the main one
+    """
+    memory = memory and threading.current_thread() is threading.main_thread()
+    # reports and spans inherited from a forked parent process are not used here
+    reports_token = _reports.set(())
+    spans_token = _spans.set(())
+    try:
+        with record(RunReport(memory=memory)) as report:
+            result = func(*args)
+    finally:
+        _spans.reset(spans_token)
+        _reports.reset(reports_token)
+    return result, report.events
+
+
+def replay(events):
+    """
+    Adds events recorded in another process to the reports which are recording,
+    messages are printed if nothing is recording
+    """
+    if not _reports.get():
+        for event in events:
+            if event.get("message"):
+                print(event["message"])
+        return
+    for event in events:
+        _emit(event)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+
+from . import instrument
+
+
+# Knockout screens of COBRA models (iML1515) with linear MOMA,
+# results have the same format as "COBRA simulation" notebook
+
+# LMOMA problems built in this process, see _get_screen
+_screens = {}
+
+
+def get_knockouts():
+    return [
+        {"gene": "fbaA", "id": "FBA"},
+        {"gene": "fbaB", "id": "FBA"},
+        {"gene": "fbp", "id": "FBP"},
+        {"gene": "gnd", "id": "GND"},
+        {"gene": "pfkA", "id": "PFK"},
+        {"gene": "pfkB", "id": "PFK"},
+        {"gene": "pgi", "id": "PGI"},
+        {"gene": "pgl", "id": "PGL"},
+        {"gene": "ppsA", "id": "PPS"},
+        {"gene": "pts", "id": "GLCptspp"},
+        {"gene": "pykA", "id": "PYK"},
+        {"gene": "pykF", "id": "PYK"},
+        {"gene": "rpe", "id": "RPE"},
+        {"gene": "rpiA", "id": "RPI"},
+        {"gene": "rpiB", "id": "RPI"},
+        {"gene": "sdhCD", "id": "SUCDi"},
+        {"gene": "sucAB", "id": "AKGDH"},
+        {"gene": "talA", "id": "TALA"},
+        {"gene": "tktA", "id": "TKT1"},
+        {"gene": "tktB", "id": "TKT1"},
+        {"gene": "tpi", "id": "TPI"},
+        {"gene": "zwf", "id": "G6PDH2r"},
+        {"gene": "gpmA", "id": "PGM"},
+    ]
+
+
+def prepare_dataframe(
+    fluxes, sample="WT", author="iML1515", glucose_flux_id="EX_glc__D_e"
+):
+    """
+    Returns tidy dataframe of fluxes (pd.Series indexed by reaction ID)
+    with fluxes normalized by glucose uptake
+    """
+    glucose_uptake = -1 * fluxes[glucose_flux_id]
+    return pd.DataFrame(
+        {
+            "ID": fluxes.index.values,
+            "flux": fluxes.values,
+            "sample_id": sample,
+            "author": author,
+            "BiGG_ID": fluxes.index.values,
+            "normalized_flux": fluxes.values * 100 / glucose_uptake,
+        }
+    )
+
+
+def load_cobra_model(model_path, bounds=None):
+    """
+    Loads COBRA model from json file and sets bounds of reactions
+    params:
+    :model_path - path to json model, e.g. iML1515.json
+    :bounds - dict reaction ID -> (lower bound, upper bound)
+    """
+    try:
+        import cobra
+    except ImportError:
+        raise ImportError("cobra is required to simulate knockouts")
+
+    model = cobra.io.load_json_model(str(model_path))
+    for reaction_id, reaction_bounds in (bounds or {}).items():
+        model.reactions.get_by_id(reaction_id).bounds = reaction_bounds
+    return model
+
+
+def add_lmoma(model, reference):
+    """
+    Replaces the objective of the model with linear MOMA: minimize sum of absolute
+    distances of fluxes from the reference, the same problem as cameo lmoma.
+    The problem is built once, knockouts only change bounds of reactions,
+    so the solver starts every knockout from the basis of the previous solution.
+    params:
+    :model - cobra.Model, modified in place
+    :reference - dict or pd.Series reaction ID -> flux, can cover only some reactions
+      (e.g. measured fluxes)
+    """
+    from optlang.symbolics import Zero
+
+    problem = model.problem
+    distances = []
+    constraints = []
+    for reaction_id, flux in reference.items():
+        if np.isnan(flux):
+            continue
+        reaction = model.reactions.get_by_id(reaction_id)
+        distance = problem.Variable(f"lmoma_distance_{reaction_id}", lb=0)
+        # distance >= |v - reference|
+        constraints.append(
+            problem.Constraint(
+                reaction.flux_expression - distance,
+                ub=flux,
+                name=f"lmoma_upper_{reaction_id}",
+            )
+        )
+        constraints.append(
+            problem.Constraint(
+                reaction.flux_expression + distance,
+                lb=flux,
+                name=f"lmoma_lower_{reaction_id}",
+            )
+        )
+        distances.append(distance)
+    model.add_cons_vars(distances + constraints)
+    model.objective = problem.Objective(Zero, direction="min", sloppy=True)
+    model.objective.set_linear_coefficients({distance: 1 for distance in distances})
+
+
+def _screen_key(model_path, reference, bounds):
+    reference = pd.Series(reference, dtype=float).sort_index()
+    sha1 = hashlib.sha1(pd.util.hash_pandas_object(reference).values.tobytes())
+    sha1.update(repr(sorted((bounds or {}).items())).encode())
+    return str(Path(model_path).resolve()), sha1.hexdigest()
+
+
+def _get_screen(model_path, reference, bounds):
+    """
+    Returns model with LMOMA problem for the reference,
+    built once per process and reused for all knockouts
+    """
+    key = _screen_key(model_path, reference, bounds)
+    if key not in _screens:
+        model = load_cobra_model(model_path, bounds)
+        add_lmoma(model, reference)
+        _screens[key] = model
+    return _screens[key]
+
+
+def _knockout_fluxes(model, knockout):
+    """
+    Returns LMOMA fluxes of the knockout or None if the model is unable to grow
+    """
+    with model:
+        model.reactions.get_by_id(knockout["id"]).knock_out()
+        solution = model.optimize()
+    if solution.status != "optimal":
+        return None
+    return solution.fluxes
+
+
+def _screen_knockouts(model, reference, bounds, knockouts, author, glucose_flux_id):
+    """
+    Simulates part of the knockouts, model is cobra.Model with LMOMA objective
+    or path to json model loaded once per process
+    """
+    if isinstance(model, (str, Path)):
+        model = _get_screen(model, reference, bounds)
+    results = []
+    for knockout in knockouts:
+        gene = knockout["gene"]
+        with instrument.span("lmoma", sample_id=gene) as event:
+            fluxes = _knockout_fluxes(model, knockout)
+            if fluxes is not None:
+                df = prepare_dataframe(fluxes, gene, author, glucose_flux_id)
+                event["rows"] = len(df)
+        if fluxes is None:
+            instrument.log(f"Unable to grow {gene}!")
+            continue
+        instrument.log(f"Simulated knockout of gene {gene}")
+        results.append(df)
+    return results
+
+
+def screen_knockouts(
+    model,
+    reference,
+    knockouts=None,
+    bounds=None,
+    save_path=None,
+    author="iML1515",
+    glucose_flux_id="EX_glc__D_e",
+    workers=None,
+):
+    """
+    Simulates knockouts with linear MOMA against the reference fluxes like
+    simulate_knockouts in "COBRA simulation" notebook, but the LMOMA problem is
+    built only once per process and every knockout only changes reaction bounds.
+    Knockouts the model is unable to grow with are skipped.
+    Returns tidy pd.DataFrame with flux, ID, BiGG_ID, author, sample_id
+    and normalized_flux columns.
+    params:
+    :model - path to json model or cobra.Model (only without workers, the model
+      is restored after the screen)
+    :reference - dict or pd.Series reaction ID -> reference flux, e.g. result.fluxes
+    :knockouts - list of dicts with gene and id of reaction, see get_knockouts
+    :bounds - dict reaction ID -> (lower bound, upper bound) set after loading
+      the model from path, e.g. growth rate of the chemostat
+    :save_path - directory to save delta_{gene}.csv files to, None to skip saving
+    :author, glucose_flux_id - see prepare_dataframe
+    :workers - number of worker processes or Executor, knockouts are split between
+      them and every worker loads one copy of the model, None to run them one by one
+    """
+    knockouts = get_knockouts() if knockouts is None else knockouts
+    if workers is None or len(knockouts) < 2:
+        if isinstance(model, (str, Path)):
+            results = _screen_knockouts(
+                model, reference, bounds, knockouts, author, glucose_flux_id
+            )
+        else:
+            # LMOMA problem is removed from the model at the end of the screen
+            with model:
+                add_lmoma(model, reference)
+                results = _screen_knockouts(
+                    model, reference, bounds, knockouts, author, glucose_flux_id
+                )
+    else:
+        if not isinstance(model, (str, Path)):
+            raise ValueError("model has to be a path to screen knockouts in workers")
+        if isinstance(workers, Executor):
+            pool = workers
+            n_chunks = len(knockouts)
+        else:
+            pool = ProcessPoolExecutor(workers)
+            n_chunks = workers
+        try:
+            # events recorded in workers are sent back with the results
+            memory = instrument._memory()
+            futures = [
+                pool.submit(
+                    instrument.run_recorded,
+                    _screen_knockouts,
+                    (model, reference, bounds, list(chunk), author, glucose_flux_id),
+                    memory,
+                )
+                for chunk in np.array_split(np.array(knockouts, dtype=object), n_chunks)
+                if len(chunk)
+            ]
+            results = []
+            for future in futures:
+                chunk_results, events = future.result()
+                instrument.replay(events)
+                results.extend(chunk_results)
+        finally:
+            if pool is not workers:
+                pool.shutdown()
+
+    if save_path is not None:
+        for df in results:
+            df.to_csv(Path(save_path) / f"delta_{df['sample_id'].iloc[0]}.csv")
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, sort=False)[
+        ["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]
+    ]
@@ -2,9 +2,9 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 
-from pathlib import Path
-from contextlib import redirect_stdout
-import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 
 from .utils import (
     get_khodayari_kos,
@@ -34,126 +34,233 @@ from .utils import (
     load_kurata,
     load_millard,
     load_chassagnole,
+    iter_khodayari,
+    iter_kurata,
+    iter_millard,
+    iter_chassagnole,
     loadmat,
 )
+from . import instrument
+from .cache import ResultCache
+from .ids import data_path, get_id_table
 
 
 # Set up paths
-data_path = Path("../data")
 path_to_results = data_path / "simulation_results"
 
-# Load ID dataframes
-khod_idf = pd.read_csv(data_path / "khodayari_id.csv")
-millard_idf = pd.read_csv(data_path / "millard_id.csv")
-kurata_idf = pd.read_csv(data_path / "kurata_id.csv")
-chassagnole_idf = pd.read_csv(data_path / "chassagnole_id.csv")
+# ID dataframes are read on first use, see ids.get_id_table
+_id_tables = {
+    "khod_idf": "Khodayari",
+    "millard_idf": "Millard",
+    "kurata_idf": "Kurata",
+    "chassagnole_idf": "Chassagnole",
+}
 
 
-def load_ko_data():
+def __getattr__(name):
+    if name in _id_tables:
+        return get_id_table(_id_tables[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Parsed simulation results are kept here between sessions
+cache_path = data_path / ".cache"
+
+
+def _get_cache(cache):
     """
-    Load all simulations of knockout phenotypes,
+    cache can be True for the default cache directory,
+    False or None to disable caching or ResultCache instance
     """
+    if cache is True:
+        return ResultCache(cache_path)
+    return cache or None
 
-    def _load_experimental_ko_data():
-        """
-        Load Ishii data
-        """
-        df = pd.read_csv("../data/datasets/ishii2007_tidy.csv")
-        # this regexp matches deletions starting with d like dpgi
-        df["sample_id"] = df.Genotype.str.extract(r"d(\w+)")
-        df.loc[df.Genotype == "WT", "sample_id"] = "WT"
-
-        df = df.assign(author="Ishii")
-        df = df.rename(
-            {
-                "Measurement_ID": "BiGG_ID",
-                "Original_Value": "normalized_flux",
-                "Value": "flux",
-                "Original_ID": "ID",
-            },
-            axis=1,
-        )
-        df = df[df["Measurement_Type"] == "flux"]
-        df.loc[df["BiGG_ID"] == "PYKF", "BiGG_ID"] = "PYK"
 
-        df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
-        return df
+def _get_pool(workers):
+    """
+    Single pool of processes shared by all loaders, None to load files one by one
+    """
+    if isinstance(workers, int):
+        return ProcessPoolExecutor(workers)
+    return nullcontext(workers)
 
-    def _load_cobra_ko_sims():
-        """
-        Load simulations from iML1515, ECC2 and iML1515 and ECC2 conditioned on experimental data
-        """
-        iml_results = pd.read_csv(
-            path_to_results / "COBRA" / "iML1515" / "chemostat_knockouts" / "knockouts_all.csv", index_col=0
-        )
-        # ecc_results = pd.read_csv(
-        #     path_to_results / "COBRA" / "ECC2" / "knockouts_all.csv", index_col=0
-        # )
 
-        exp_iml_results = pd.read_csv(
-            path_to_results / "COBRA" / "Exp_iML1515" / "chemostat_knockouts" / "knockouts_all.csv", index_col=0
-        )
-        # exp_ecc_results = pd.read_csv(
-        #     path_to_results / "COBRA" / "Exp_ECC2" / "knockouts_all.csv", index_col=0
-        # )
-
-        df = pd.concat([iml_results, exp_iml_results])
-        # Fix direction to match experimental data
-        # Only for iML1515
-        # fix PGM direction
-        
-        iml_reversed = ["PGM", "PGK", "SUCOAS"]
-        
-        df.loc[df["ID"].isin(iml_reversed), "flux"] = (
-            -1 * df.loc[df["ID"].isin(iml_reversed), "flux"]
-        )
-        df.loc[df["ID"].isin(iml_reversed), "normalized_flux"] = (
-            -1 * df.loc[df["ID"].isin(iml_reversed), "normalized_flux"]
-        )
+def _run_loaders(loaders, workers):
+    """
+    Calls loaders (functions without arguments) and returns their results in order.
+    With a pool of workers the loaders run in threads, so files of all of them are
+    queued in the pool at once and the wall time is roughly the time of the slowest
+    file instead of the sum of the slowest files of every loader.
+    Events of every loader are recorded separately and replayed in order.
+    Loaders run one by one while memory is traced, tracemalloc is not thread-safe
+    (see instrument.RunReport).
+    """
+    if workers is None or instrument._memory():
+        return [loader() for loader in loaders]
 
-        # df = pd.concat([df, ecc_results, exp_ecc_results])
-        # For both iML1515 and ECC2
-        # fix RPI direction
-        ecc_reversed = ["RPI"]
-        df.loc[df["ID"].isin(ecc_reversed), "flux"] = (
-            -1 * df.loc[df["ID"].isin(ecc_reversed), "flux"]
-        )
-        df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"] = (
-            -1 * df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"]
-        )
+    with ThreadPoolExecutor(len(loaders)) as threads:
+        futures = [
+            threads.submit(instrument.run_recorded, loader, ())
+            for loader in loaders
+        ]
+        results = []
+        for future in futures:
+            result, events = future.result()
+            instrument.replay(events)
+            results.append(result)
+    return results
+
+
+def _read_csv(cache, path, **kwargs):
+    if cache is None:
+        return pd.read_csv(path, **kwargs)
+    return cache.load(path, ("read_csv", kwargs), lambda: pd.read_csv(path, **kwargs))
+
+
+def _load_experimental_ko_data(
+    cache,
+    path=data_path / "datasets" / "ishii2007_tidy.csv",
+    author="Ishii",
+    errors=False,
+):
+    """
+    Load Ishii data (or other tidy knockout dataset in the same format),
+    reported errors are kept in normalized_flux_error column only if errors
+    """
+    df = _read_csv(cache, path)
+    # this regexp matches deletions starting with d like dpgi
+    df["sample_id"] = df.Genotype.str.extract(r"d(\w+)")
+    df.loc[df.Genotype == "WT", "sample_id"] = "WT"
+
+    df = df.assign(author=author)
+    df = df.rename(
+        {
+            "Measurement_ID": "BiGG_ID",
+            "Original_Value": "normalized_flux",
+            "Original_Error": "normalized_flux_error",
+            "Value": "flux",
+            "Original_ID": "ID",
+        },
+        axis=1,
+    )
+    df = df[df["Measurement_Type"] == "flux"]
+    df.loc[df["BiGG_ID"] == "PYKF", "BiGG_ID"] = "PYK"
+
+    columns = ["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]
+    if errors:
+        # reported error is used by calculate_metrics.bootstrap_summary_errors
+        columns.append("normalized_flux_error")
+    return df[columns]
 
-        return df
+
+def _load_cobra_ko_sims(cache):
+    """
+    Load simulations from iML1515, ECC2 and iML1515 and ECC2 conditioned on experimental data
+    """
+    iml_results = _read_csv(
+        cache,
+        path_to_results / "COBRA" / "iML1515" / "chemostat_knockouts" / "knockouts_all.csv", index_col=0
+    )
+    # ecc_results = pd.read_csv(
+    #     path_to_results / "COBRA" / "ECC2" / "knockouts_all.csv", index_col=0
+    # )
+
+    exp_iml_results = _read_csv(
+        cache,
+        path_to_results / "COBRA" / "Exp_iML1515" / "chemostat_knockouts" / "knockouts_all.csv", index_col=0
+    )
+    # exp_ecc_results = pd.read_csv(
+    #     path_to_results / "COBRA" / "Exp_ECC2" / "knockouts_all.csv", index_col=0
+    # )
+
+    df = pd.concat([iml_results, exp_iml_results])
+    # Fix direction to match experimental data
+    # Only for iML1515
+    # fix PGM direction
+
+    iml_reversed = ["PGM", "PGK", "SUCOAS"]
+
+    df.loc[df["ID"].isin(iml_reversed), "flux"] = (
+        -1 * df.loc[df["ID"].isin(iml_reversed), "flux"]
+    )
+    df.loc[df["ID"].isin(iml_reversed), "normalized_flux"] = (
+        -1 * df.loc[df["ID"].isin(iml_reversed), "normalized_flux"]
+    )
+
+    # df = pd.concat([df, ecc_results, exp_ecc_results])
+    # For both iML1515 and ECC2
+    # fix RPI direction
+    ecc_reversed = ["RPI"]
+    df.loc[df["ID"].isin(ecc_reversed), "flux"] = (
+        -1 * df.loc[df["ID"].isin(ecc_reversed), "flux"]
+    )
+    df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"] = (
+        -1 * df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"]
+    )
+
+    return df
+
+
+@instrument.timed("load_ko_data")
+def load_ko_data(cache=True, workers=None, errors=False):
+    """
+    Load all simulations of knockout phenotypes,
+    parsed files are reused from cache unless cache=False,
+    workers is the number of processes used to parse simulation files,
+    errors adds normalized_flux_error column with errors reported for Ishii data
+    (only the WT sample has them), see calculate_metrics.bootstrap_summary_errors
+    """
 
     def _load_kinetic_ko_sims():
         """
         Load the data from kinetic models simulations
         """
-        khodayari_results = load_khodayari(
-            sample_names="all",
-            load_path=(path_to_results / "Khodayari"),
-            id_df=khod_idf,
-            files=get_khodayari_kos(),
-        )
-
-        kurata_results = load_kurata(
-            sample_names="all",
-            load_path=(path_to_results / "Kurata"),
-            id_df=kurata_idf,
-            files=get_kurata_kos(),
-        )
-
-        millard_results = load_millard(
-            sample_names="all",
-            load_path=(path_to_results / "Millard"),
-            id_df=millard_idf,
-            files=get_millard_kos(),
-        )
-
-        chassagnole_results = load_chassagnole(
-            sample_names="all",
-            load_path=(path_to_results / "Chassagnole" / "chemostat_knockouts"),
-            id_df=chassagnole_idf,
-            files=get_chassagnole_kos(),
+        (
+            khodayari_results,
+            kurata_results,
+            millard_results,
+            chassagnole_results,
+        ) = _run_loaders(
+            [
+                partial(
+                    load_khodayari,
+                    sample_names="all",
+                    load_path=(path_to_results / "Khodayari"),
+                    id_df=get_id_table("Khodayari"),
+                    files=get_khodayari_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_kurata,
+                    sample_names="all",
+                    load_path=(path_to_results / "Kurata"),
+                    id_df=get_id_table("Kurata"),
+                    files=get_kurata_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_millard,
+                    sample_names="all",
+                    load_path=(path_to_results / "Millard"),
+                    id_df=get_id_table("Millard"),
+                    files=get_millard_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_chassagnole,
+                    sample_names="all",
+                    load_path=(path_to_results / "Chassagnole" / "chemostat_knockouts"),
+                    id_df=get_id_table("Chassagnole"),
+                    files=get_chassagnole_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+            ],
+            workers,
         )
 
         simulation_results = pd.concat(
@@ -161,260 +268,450 @@ def load_ko_data():
         )
         return simulation_results
 
-    with io.StringIO() as buf, redirect_stdout(buf):
+    cache = _get_cache(cache)
+    with _get_pool(workers) as workers, instrument.record() as report:
         simulation_data = _load_kinetic_ko_sims()
-        cobra_data = _load_cobra_ko_sims()
-        exp_data = _load_experimental_ko_data()
-        file_info = buf.getvalue()
+        cobra_data = _load_cobra_ko_sims(cache)
+        exp_data = _load_experimental_ko_data(cache, errors=errors)
+        file_info = report.text()
     return pd.concat([simulation_data, cobra_data, exp_data], sort=False), file_info
 
 
-def load_dilution_data():
-    def _load_cobra_dilution_sims():
-        """
-        Load simulations from iML1515, ECC2
-        """
-        iml_results = pd.read_csv(
-            path_to_results / "COBRA" / "iML1515" / "dilutions" / "all.csv", index_col=0
-        )
-        # ecc_results = pd.read_csv(
-        #     path_to_results / "COBRA" / "ECC2" / "dilutions" / "all.csv", index_col=0
-        # )
-
-        df = iml_results
-        # Fix direction to match experimental data
-        # Only for iML1515
-        # fix PGM direction
-        iml_reversed = ["PGM", "PGK", "SUCOAS"]
-        
-        df.loc[df["ID"].isin(iml_reversed), "flux"] = (
-            -1 * df.loc[df["ID"].isin(iml_reversed), "flux"]
-        )
-        df.loc[df["ID"].isin(iml_reversed), "normalized_flux"] = (
-            -1 * df.loc[df["ID"].isin(iml_reversed), "normalized_flux"]
-        )
+def iter_ko_data(cache=True):
+    """
+    Generator version of load_ko_data, yields (author, sample_id, dataframe)
+    for one sample at a time, so only a single simulation file is parsed
+    and kept in memory at once. Small COBRA and experimental tables
+    are yielded per sample after the kinetic models.
+    The flux vector of a sample is the flux column of its dataframe, it is yielded
+    with the ID, BiGG_ID and normalized_flux columns because reactions differ
+    between models (and between samples of the experimental data) and
+    MetricsStore.update takes the same tidy rows as load_ko_data returns.
+    """
+    cache = _get_cache(cache)
+    yield from iter_khodayari(
+        sample_names="all",
+        load_path=(path_to_results / "Khodayari"),
+        id_df=get_id_table("Khodayari"),
+        files=get_khodayari_kos(),
+        cache=cache,
+    )
+    yield from iter_kurata(
+        sample_names="all",
+        load_path=(path_to_results / "Kurata"),
+        id_df=get_id_table("Kurata"),
+        files=get_kurata_kos(),
+        cache=cache,
+    )
+    yield from iter_millard(
+        sample_names="all",
+        load_path=(path_to_results / "Millard"),
+        id_df=get_id_table("Millard"),
+        files=get_millard_kos(),
+        cache=cache,
+    )
+    yield from iter_chassagnole(
+        sample_names="all",
+        load_path=(path_to_results / "Chassagnole" / "chemostat_knockouts"),
+        id_df=get_id_table("Chassagnole"),
+        files=get_chassagnole_kos(),
+        cache=cache,
+    )
+    yield from _iter_samples(
+        _load_cobra_ko_sims(cache), _load_experimental_ko_data(cache)
+    )
 
-        # df = pd.concat([df, ecc_results])
-        # For both iML1515 and ECC2
-        # fix RPI direction
-        ecc_reversed = ["RPI"]
-        df.loc[df["ID"].isin(ecc_reversed), "flux"] = (
-            -1 * df.loc[df["ID"].isin(ecc_reversed), "flux"]
-        )
-        df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"] = (
-            -1 * df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"]
-        )
 
-        return df
-
-    def _load_experimental_dilution_data():
-        yao_df = pd.read_csv(data_path / "datasets" / "yao2011_tidy.csv")
-        consumption_rates = yao_df.query('Measurement_Type == "consumption_rate"')
-        yao_fluxes = yao_df.query('Measurement_Type == "flux"')
-
-        def normalize_to_uptake(group):
-            consumption_rate = consumption_rates.loc[
-                consumption_rates.Dilution == group.name, "Value"
-            ].values[0]
-            print(f"Consumption rate for D {group.name} is {consumption_rate}")
-            group = group.assign(
-                normalized_flux=lambda x: x.Value / consumption_rate * 100
-            )
-            return group
-
-        df = (
-            yao_fluxes.groupby("Dilution")
-            .apply(normalize_to_uptake)
-            .reset_index(drop=True)
-        )
+def _iter_samples(*frames):
+    """
+    Yields (author, sample_id, dataframe) for every sample of the small tables
+    """
+    for df in frames:
+        for (author, sample_id), sample_df in df.groupby(["author", "sample_id"]):
+            yield author, sample_id, sample_df
 
-        df = df.assign(author="Yao")
-        df = df.rename(
-            {
-                "Measurement_ID": "BiGG_ID",
-                "Value": "flux",
-                "Original_ID": "ID",
-                "Dilution": "sample_id",
-            },
-            axis=1,
-        )
-        df = df[df["Measurement_Type"] == "flux"]
 
-        df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
-        df.sample_id = df.sample_id.apply(str)
-        return df
+def _load_cobra_dilution_sims(cache):
+    """
+    Load simulations from iML1515, ECC2
+    """
+    iml_results = _read_csv(
+        cache,
+        path_to_results / "COBRA" / "iML1515" / "dilutions" / "all.csv", index_col=0
+    )
+    # ecc_results = pd.read_csv(
+    #     path_to_results / "COBRA" / "ECC2" / "dilutions" / "all.csv", index_col=0
+    # )
+
+    df = iml_results
+    # Fix direction to match experimental data
+    # Only for iML1515
+    # fix PGM direction
+    iml_reversed = ["PGM", "PGK", "SUCOAS"]
+
+    df.loc[df["ID"].isin(iml_reversed), "flux"] = (
+        -1 * df.loc[df["ID"].isin(iml_reversed), "flux"]
+    )
+    df.loc[df["ID"].isin(iml_reversed), "normalized_flux"] = (
+        -1 * df.loc[df["ID"].isin(iml_reversed), "normalized_flux"]
+    )
 
-    def _load_kinetic_dilution_sims():
-        khodayari_dil = load_khodayari(
-            sample_names="all",
-            load_path=(path_to_results / "Khodayari" / "dilutions"),
-            id_df=khod_idf,
-            files=get_khodayari_dilutions(),
-        )
-        kurata_dil = load_kurata(
-            sample_names="all",
-            load_path=(path_to_results / "Kurata" / "dilutions"),
-            id_df=kurata_idf,
-            files=get_kurata_dilutions(),
-        )
-        millard_dil = load_millard(
-            sample_names="all",
-            load_path=(path_to_results / "Millard" / "dilutions"),
-            id_df=millard_idf,
-            files=get_millard_dilutions(),
+    # df = pd.concat([df, ecc_results])
+    # For both iML1515 and ECC2
+    # fix RPI direction
+    ecc_reversed = ["RPI"]
+    df.loc[df["ID"].isin(ecc_reversed), "flux"] = (
+        -1 * df.loc[df["ID"].isin(ecc_reversed), "flux"]
+    )
+    df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"] = (
+        -1 * df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"]
+    )
+
+    return df
+
+
+def _load_experimental_dilution_data(cache):
+    yao_df = _read_csv(cache, data_path / "datasets" / "yao2011_tidy.csv")
+    consumption_rates = yao_df.query('Measurement_Type == "consumption_rate"')
+    yao_fluxes = yao_df.query('Measurement_Type == "flux"')
+
+    def normalize_to_uptake(group):
+        consumption_rate = consumption_rates.loc[
+            consumption_rates.Dilution == group.name, "Value"
+        ].values[0]
+        instrument.log(f"Consumption rate for D {group.name} is {consumption_rate}")
+        group = group.assign(
+            normalized_flux=lambda x: x.Value / consumption_rate * 100
         )
+        return group
+
+    df = (
+        yao_fluxes.groupby("Dilution")
+        .apply(normalize_to_uptake)
+        .reset_index(drop=True)
+    )
+
+    df = df.assign(author="Yao")
+    df = df.rename(
+        {
+            "Measurement_ID": "BiGG_ID",
+            "Value": "flux",
+            "Original_ID": "ID",
+            "Dilution": "sample_id",
+        },
+        axis=1,
+    )
+    df = df[df["Measurement_Type"] == "flux"]
+
+    df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
+    df.sample_id = df.sample_id.apply(str)
+    return df
+
 
-        chassagnole_dil = load_chassagnole(
-            sample_names="all",
-            load_path=(path_to_results / "Chassagnole" / "dilutions"),
-            id_df=chassagnole_idf,
-            files=get_chassagnole_dilutions(),
+@instrument.timed("load_dilution_data")
+def load_dilution_data(cache=True, workers=None):
+    """
+    Load simulations for different dilution rates,
+    parsed files are reused from cache unless cache=False,
+    workers is the number of processes used to parse simulation files
+    """
+    def _load_kinetic_dilution_sims():
+        khodayari_dil, kurata_dil, millard_dil, chassagnole_dil = _run_loaders(
+            [
+                partial(
+                    load_khodayari,
+                    sample_names="all",
+                    load_path=(path_to_results / "Khodayari" / "dilutions"),
+                    id_df=get_id_table("Khodayari"),
+                    files=get_khodayari_dilutions(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_kurata,
+                    sample_names="all",
+                    load_path=(path_to_results / "Kurata" / "dilutions"),
+                    id_df=get_id_table("Kurata"),
+                    files=get_kurata_dilutions(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_millard,
+                    sample_names="all",
+                    load_path=(path_to_results / "Millard" / "dilutions"),
+                    id_df=get_id_table("Millard"),
+                    files=get_millard_dilutions(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_chassagnole,
+                    sample_names="all",
+                    load_path=(path_to_results / "Chassagnole" / "dilutions"),
+                    id_df=get_id_table("Chassagnole"),
+                    files=get_chassagnole_dilutions(),
+                    cache=cache,
+                    workers=workers,
+                ),
+            ],
+            workers,
         )
         return pd.concat([khodayari_dil, kurata_dil, millard_dil, chassagnole_dil], sort=False)
 
-    with io.StringIO() as buf, redirect_stdout(buf):
+    cache = _get_cache(cache)
+    with _get_pool(workers) as workers, instrument.record() as report:
         simulation_data = _load_kinetic_dilution_sims()
-        exp_data = _load_experimental_dilution_data()
-        cobra_data = _load_cobra_dilution_sims()
-        file_info = buf.getvalue()
+        exp_data = _load_experimental_dilution_data(cache)
+        cobra_data = _load_cobra_dilution_sims(cache)
+        file_info = report.text()
     return pd.concat([simulation_data, exp_data, cobra_data], sort=False), file_info
 
 
-def load_sensitivity_data():
-    def _load_kinetic_sensitivity_sims():
-        khodayari_zwf = load_khodayari(
-            sample_names="all",
-            load_path=(path_to_results / "Khodayari" / "zwf_sensitivity"),
-            id_df=khod_idf,
-            files=get_khodayari_zwf(),
-        )
-        khodayari_pgi = load_khodayari(
-            sample_names="all",
-            load_path=(path_to_results / "Khodayari" / "pgi_sensitivity"),
-            id_df=khod_idf,
-            files=get_khodayari_pgi(),
-        )
-        khodayari_eno = load_khodayari(
-            sample_names="all",
-            load_path=(path_to_results / "Khodayari" / "eno_sensitivity"),
-            id_df=khod_idf,
-            files=get_khodayari_eno(),
-        )
-        kurata_zwf = load_kurata(
-            sample_names="all",
-            load_path=(path_to_results / "Kurata" / "zwf_sensitivity"),
-            id_df=kurata_idf,
-            files=get_kurata_zwf(),
-        )
-        kurata_pgi = load_kurata(
-            sample_names="all",
-            load_path=(path_to_results / "Kurata" / "pgi_sensitivity"),
-            id_df=kurata_idf,
-            files=get_kurata_pgi(),
-        )
-        kurata_eno = load_kurata(
-            sample_names="all",
-            load_path=(path_to_results / "Kurata" / "eno_sensitivity"),
-            id_df=kurata_idf,
-            files=get_kurata_eno(),
-        )
-        millard_zwf = load_millard(
-            sample_names="all",
-            load_path=(path_to_results / "Millard" / "zwf_sensitivity"),
-            id_df=millard_idf,
-            files=get_millard_zwf(),
-        )
-        millard_pgi = load_millard(
-            sample_names="all",
-            load_path=(path_to_results / "Millard" / "pgi_sensitivity"),
-            id_df=millard_idf,
-            files=get_millard_pgi(),
-        )
-        millard_eno = load_millard(
-            sample_names="all",
-            load_path=(path_to_results / "Millard" / "eno_sensitivity"),
-            id_df=millard_idf,
-            files=get_millard_eno(),
-        )
-        chassagnole_zwf = load_chassagnole(
-            sample_names="all",
-            load_path=(path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"),
-            id_df=chassagnole_idf,
-            files=get_chassagnole_zwf(),
-        )
-        chassagnole_pgi = load_chassagnole(
-            sample_names="all",
-            load_path=(path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"),
-            id_df=chassagnole_idf,
-            files=get_chassagnole_pgi(),
-        )
-        chassagnole_eno = load_chassagnole(
-            sample_names="all",
-            load_path=(path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"),
-            id_df=chassagnole_idf,
-            files=get_chassagnole_eno(),
-        )
+def iter_dilution_data(cache=True):
+    """
+    Generator version of load_dilution_data, yields (author, sample_id, dataframe)
+    for one sample at a time, see iter_ko_data
+    """
+    cache = _get_cache(cache)
+    yield from iter_khodayari(
+        sample_names="all",
+        load_path=(path_to_results / "Khodayari" / "dilutions"),
+        id_df=get_id_table("Khodayari"),
+        files=get_khodayari_dilutions(),
+        cache=cache,
+    )
+    yield from iter_kurata(
+        sample_names="all",
+        load_path=(path_to_results / "Kurata" / "dilutions"),
+        id_df=get_id_table("Kurata"),
+        files=get_kurata_dilutions(),
+        cache=cache,
+    )
+    yield from iter_millard(
+        sample_names="all",
+        load_path=(path_to_results / "Millard" / "dilutions"),
+        id_df=get_id_table("Millard"),
+        files=get_millard_dilutions(),
+        cache=cache,
+    )
+    yield from iter_chassagnole(
+        sample_names="all",
+        load_path=(path_to_results / "Chassagnole" / "dilutions"),
+        id_df=get_id_table("Chassagnole"),
+        files=get_chassagnole_dilutions(),
+        cache=cache,
+    )
+    yield from _iter_samples(
+        _load_experimental_dilution_data(cache), _load_cobra_dilution_sims(cache)
+    )
 
-        simulation_zwf = pd.concat([khodayari_zwf, kurata_zwf, millard_zwf, chassagnole_zwf], sort=False)
-        simulation_pgi = pd.concat([khodayari_pgi, kurata_pgi, millard_pgi, chassagnole_pgi], sort=False)
-        simulation_eno = pd.concat([khodayari_eno, kurata_eno, millard_eno, chassagnole_eno], sort=False)
-        return (simulation_zwf, simulation_pgi, simulation_eno)
 
-    def _load_experimental_sensitivity_data():
-        """
-        Load experimental results and return a tuple of 3 dataframes each corresponding to 
-        genes zwf, pgi and eno
-        """
+def _load_experimental_sensitivity_data(cache):
+    """
+    Load experimental results and return a tuple of 3 dataframes each corresponding to 
+    genes zwf, pgi and eno
+    """
 
-        """
-        Nicloas, 2007 data, for zwf knockout
-        """
-        df = pd.read_csv("../data/datasets/nicolas2007_tidy.csv")
-
-        df = df.assign(author="Nicolas")
-        df = df.rename(
-            {
-                "Measurement_ID": "BiGG_ID",
-                "Original_Value": "normalized_flux",
-                "Value": "flux",
-                "Original_ID": "ID",
-                "Genotype": "sample_id",
-            },
-            axis=1,
-        )
-        df = df[df["Measurement_Type"] == "flux"]
+    """
+    Nicloas, 2007 data, for zwf knockout
+    """
+    df = _read_csv(cache, data_path / "datasets" / "nicolas2007_tidy.csv")
+
+    df = df.assign(author="Nicolas")
+    df = df.rename(
+        {
+            "Measurement_ID": "BiGG_ID",
+            "Original_Value": "normalized_flux",
+            "Value": "flux",
+            "Original_ID": "ID",
+            "Genotype": "sample_id",
+        },
+        axis=1,
+    )
+    df = df[df["Measurement_Type"] == "flux"]
 
-        df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
-        exp_results_zwf = df
+    df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
+    exp_results_zwf = df
 
-        """
-        Usui, 2012 data for pgi and eno data
-        """
-        df = pd.read_csv("../data/datasets/usui2012_tidy.csv")
-        df = df.assign(author="Usui")
-        df = df.rename(
-            {
-                "Measurement_ID": "BiGG_ID",
-                "Original_Value": "normalized_flux",
-                "Value": "flux",
-                "Original_ID": "ID",
-                "Genotype": "sample_id",
-            },
-            axis=1,
+    """
+    Usui, 2012 data for pgi and eno data
+    """
+    df = _read_csv(cache, data_path / "datasets" / "usui2012_tidy.csv")
+    df = df.assign(author="Usui")
+    df = df.rename(
+        {
+            "Measurement_ID": "BiGG_ID",
+            "Original_Value": "normalized_flux",
+            "Value": "flux",
+            "Original_ID": "ID",
+            "Genotype": "sample_id",
+        },
+        axis=1,
+    )
+    df = df[df["Measurement_Type"] == "flux"]
+
+    df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
+    exp_results_pgi = df
+    exp_results_eno = df
+    return (exp_results_zwf, exp_results_pgi, exp_results_eno)
+
+
+@instrument.timed("load_sensitivity_data")
+def load_sensitivity_data(cache=True, workers=None):
+    """
+    Load simulations for zwf, pgi and eno expression levels,
+    parsed files are reused from cache unless cache=False,
+    workers is the number of processes used to parse simulation files
+    """
+    def _load_kinetic_sensitivity_sims():
+        (
+            khodayari_zwf,
+            khodayari_pgi,
+            khodayari_eno,
+            kurata_zwf,
+            kurata_pgi,
+            kurata_eno,
+            millard_zwf,
+            millard_pgi,
+            millard_eno,
+            chassagnole_zwf,
+            chassagnole_pgi,
+            chassagnole_eno,
+        ) = _run_loaders(
+            [
+                partial(
+                    load_khodayari,
+                    sample_names="all",
+                    load_path=(path_to_results / "Khodayari" / "zwf_sensitivity"),
+                    id_df=get_id_table("Khodayari"),
+                    files=get_khodayari_zwf(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_khodayari,
+                    sample_names="all",
+                    load_path=(path_to_results / "Khodayari" / "pgi_sensitivity"),
+                    id_df=get_id_table("Khodayari"),
+                    files=get_khodayari_pgi(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_khodayari,
+                    sample_names="all",
+                    load_path=(path_to_results / "Khodayari" / "eno_sensitivity"),
+                    id_df=get_id_table("Khodayari"),
+                    files=get_khodayari_eno(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_kurata,
+                    sample_names="all",
+                    load_path=(path_to_results / "Kurata" / "zwf_sensitivity"),
+                    id_df=get_id_table("Kurata"),
+                    files=get_kurata_zwf(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_kurata,
+                    sample_names="all",
+                    load_path=(path_to_results / "Kurata" / "pgi_sensitivity"),
+                    id_df=get_id_table("Kurata"),
+                    files=get_kurata_pgi(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_kurata,
+                    sample_names="all",
+                    load_path=(path_to_results / "Kurata" / "eno_sensitivity"),
+                    id_df=get_id_table("Kurata"),
+                    files=get_kurata_eno(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_millard,
+                    sample_names="all",
+                    load_path=(path_to_results / "Millard" / "zwf_sensitivity"),
+                    id_df=get_id_table("Millard"),
+                    files=get_millard_zwf(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_millard,
+                    sample_names="all",
+                    load_path=(path_to_results / "Millard" / "pgi_sensitivity"),
+                    id_df=get_id_table("Millard"),
+                    files=get_millard_pgi(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_millard,
+                    sample_names="all",
+                    load_path=(path_to_results / "Millard" / "eno_sensitivity"),
+                    id_df=get_id_table("Millard"),
+                    files=get_millard_eno(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_chassagnole,
+                    sample_names="all",
+                    load_path=(
+                        path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"
+                    ),
+                    id_df=get_id_table("Chassagnole"),
+                    files=get_chassagnole_zwf(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_chassagnole,
+                    sample_names="all",
+                    load_path=(
+                        path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"
+                    ),
+                    id_df=get_id_table("Chassagnole"),
+                    files=get_chassagnole_pgi(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_chassagnole,
+                    sample_names="all",
+                    load_path=(
+                        path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"
+                    ),
+                    id_df=get_id_table("Chassagnole"),
+                    files=get_chassagnole_eno(),
+                    cache=cache,
+                    workers=workers,
+                ),
+            ],
+            workers,
         )
-        df = df[df["Measurement_Type"] == "flux"]
 
-        df = df[["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]]
-        exp_results_pgi = df
-        exp_results_eno = df
-        return (exp_results_zwf, exp_results_pgi, exp_results_eno)
+        simulation_zwf = pd.concat([khodayari_zwf, kurata_zwf, millard_zwf, chassagnole_zwf], sort=False)
+        simulation_pgi = pd.concat([khodayari_pgi, kurata_pgi, millard_pgi, chassagnole_pgi], sort=False)
+        simulation_eno = pd.concat([khodayari_eno, kurata_eno, millard_eno, chassagnole_eno], sort=False)
+        return (simulation_zwf, simulation_pgi, simulation_eno)
 
-    with io.StringIO() as buf, redirect_stdout(buf):
+    cache = _get_cache(cache)
+    with _get_pool(workers) as workers, instrument.record() as report:
         simulation_data_zwf, simulation_data_pgi, simulation_data_eno = (
             _load_kinetic_sensitivity_sims()
         )
-        exp_data_zwf, exp_data_pgi, exp_data_eno = _load_experimental_sensitivity_data()
-        file_info = buf.getvalue()
+        exp_data_zwf, exp_data_pgi, exp_data_eno = (
+            _load_experimental_sensitivity_data(cache)
+        )
+        file_info = report.text()
     return (
         (
             pd.concat([simulation_data_zwf, exp_data_zwf], sort=False),
@@ -425,162 +722,284 @@ def load_sensitivity_data():
     )
 
 
-def load_batch_ko_data():
+def iter_sensitivity_data(gene, cache=True):
     """
-    Load all simulations,
+    Generator version of load_sensitivity_data for one of the genes,
+    yields (author, sample_id, dataframe) for one sample at a time, see iter_ko_data
+    params:
+    :gene - zwf, pgi or eno
     """
+    genes = ["zwf", "pgi", "eno"]
+    if gene not in genes:
+        raise ValueError(f"Unknown gene {gene}, use zwf, pgi or eno")
+    files = {
+        "zwf": [
+            get_khodayari_zwf, get_kurata_zwf, get_millard_zwf, get_chassagnole_zwf
+        ],
+        "pgi": [
+            get_khodayari_pgi, get_kurata_pgi, get_millard_pgi, get_chassagnole_pgi
+        ],
+        "eno": [
+            get_khodayari_eno, get_kurata_eno, get_millard_eno, get_chassagnole_eno
+        ],
+    }[gene]
+
+    cache = _get_cache(cache)
+    yield from iter_khodayari(
+        sample_names="all",
+        load_path=(path_to_results / "Khodayari" / f"{gene}_sensitivity"),
+        id_df=get_id_table("Khodayari"),
+        files=files[0](),
+        cache=cache,
+    )
+    yield from iter_kurata(
+        sample_names="all",
+        load_path=(path_to_results / "Kurata" / f"{gene}_sensitivity"),
+        id_df=get_id_table("Kurata"),
+        files=files[1](),
+        cache=cache,
+    )
+    yield from iter_millard(
+        sample_names="all",
+        load_path=(path_to_results / "Millard" / f"{gene}_sensitivity"),
+        id_df=get_id_table("Millard"),
+        files=files[2](),
+        cache=cache,
+    )
+    yield from iter_chassagnole(
+        sample_names="all",
+        load_path=(path_to_results / "Chassagnole" / "zwf_pgi_eno_sensitivity"),
+        id_df=get_id_table("Chassagnole"),
+        files=files[3](),
+        cache=cache,
+    )
+    exp_data = _load_experimental_sensitivity_data(cache)
+    yield from _iter_samples(exp_data[genes.index(gene)])
+
+
+def _load_experimental_batch_ko_data(cache):
+    long_df = _read_csv(cache, data_path / "datasets" / "long2019_tidy.csv")
+    long_df["sample_id"] = long_df.Genotype
+    long_df = long_df.assign(author="Long").rename(
+        {
+            "Measurement_ID": "BiGG_ID",
+            "Original_Value": "normalized_flux",
+            "Value": "flux",
+            "Original_ID": "ID",
+        },
+        axis=1,
+    )
+    long_df = long_df[long_df["Measurement_Type"] == "flux"]
+    long_df = long_df[~long_df["BiGG_ID"].isna()]
+    # the same reaction as rpe
+    long_df = long_df[long_df["sample_id"] != "sgcE"]
+    long_df = long_df[
+        ["BiGG_ID", "ID", "flux", "author", "sample_id", "normalized_flux"]
+    ]
 
-    def _load_exp_data():
-        long_df = pd.read_csv(data_path / "datasets" / "long2019_tidy.csv")
-        long_df["sample_id"] = long_df.Genotype
-        long_df = long_df.assign(author="Long").rename(
-            {
-                "Measurement_ID": "BiGG_ID",
-                "Original_Value": "normalized_flux",
-                "Value": "flux",
-                "Original_ID": "ID",
-            },
-            axis=1,
-        )
-        long_df = long_df[long_df["Measurement_Type"] == "flux"]
-        long_df = long_df[~long_df["BiGG_ID"].isna()]
-        # the same reaction as rpe
-        long_df = long_df[long_df["sample_id"] != "sgcE"]
-        long_df = long_df[
-            ["BiGG_ID", "ID", "flux", "author", "sample_id", "normalized_flux"]
-        ]
+    """
+    douglas_flux_data = pd.read_csv("../../../DataAnalysis/DouglasKineticData/data/flux_data_processed.csv", index_col=0)
+    douglas_sample_names = {
+        "Evo04": "WT",
+        "Evo04gnd": "gnd",
+        "Evo04pgi": "pgi",
+        "Evo04sdhCB": "sdh",
+        "Evo04tpiA": "tpi",
+    }
+    douglas_exp_df = douglas_flux_data.query(
+    "sample_name in @douglas_sample_names.keys()"
+    )
+    douglas_exp_df["sample_id"] = douglas_exp_df.sample_name.apply(
+        lambda x: douglas_sample_names[x]
+    )
+    douglas_exp_df["author"] = "McCloskey"
+    douglas_exp_df = douglas_exp_df.rename(
+        {"rxn_id": "BiGG_ID", "sampling_median": "flux"}, axis=1
+    ).drop(["sampling_var", "sampling_min", "sampling_max", "sample_name"], axis=1)
+    x_doug = douglas_exp_df.set_index(["author", "sample_id", "BiGG_ID"]).to_xarray()
+    x_doug['normalized_flux'] = 100*(x_doug.flux / x_doug.sel(BiGG_ID="GLCptspp").flux)
+    mccloskey_results = x_doug.to_dataframe().reset_index()
+    mccloskey_results.head()
+    """
 
-        """
-        douglas_flux_data = pd.read_csv("../../../DataAnalysis/DouglasKineticData/data/flux_data_processed.csv", index_col=0)
-        douglas_sample_names = {
-            "Evo04": "WT",
-            "Evo04gnd": "gnd",
-            "Evo04pgi": "pgi",
-            "Evo04sdhCB": "sdh",
-            "Evo04tpiA": "tpi",
-        }
-        douglas_exp_df = douglas_flux_data.query(
-        "sample_name in @douglas_sample_names.keys()"
-        )
-        douglas_exp_df["sample_id"] = douglas_exp_df.sample_name.apply(
-            lambda x: douglas_sample_names[x]
-        )
-        douglas_exp_df["author"] = "McCloskey"
-        douglas_exp_df = douglas_exp_df.rename(
-            {"rxn_id": "BiGG_ID", "sampling_median": "flux"}, axis=1
-        ).drop(["sampling_var", "sampling_min", "sampling_max", "sample_name"], axis=1)
-        x_doug = douglas_exp_df.set_index(["author", "sample_id", "BiGG_ID"]).to_xarray()
-        x_doug['normalized_flux'] = 100*(x_doug.flux / x_doug.sel(BiGG_ID="GLCptspp").flux)
-        mccloskey_results = x_doug.to_dataframe().reset_index()
-        mccloskey_results.head()
-        """
+    return long_df
 
-        return long_df
 
-    def _load_kinetic_ko_sims():
-        """
-        Load the data from kinetic models simulations
-        """
-        khodayari_results = load_khodayari(
-            sample_names="all",
-            load_path=(path_to_results / "Khodayari"),
-            id_df=khod_idf,
-            files=get_khodayari_batch_kos(),
-        )
+def _load_cobra_batch_ko_sims(cache):
+    """
+    Load simulations from iML1515, ECC2 and iML1515 and ECC2 conditioned on experimental data
+    """
+    iml_results = _read_csv(
+        cache,
+        path_to_results
+        / "COBRA"
+        / "iML1515"
+        / "batch_knockouts"
+        / "knockouts_all.csv",
+        index_col=0,
+    )
+    # ecc_results = pd.read_csv(
+    #     path_to_results
+    #     / "COBRA"
+    #     / "ECC2"
+    #     / "batch_knockouts"
+    #     / "knockouts_all.csv",
+    #     index_col=0,
+    # )
+
+    exp_iml_results = _read_csv(
+        cache,
+        path_to_results
+        / "COBRA"
+        / "Exp_iML1515"
+        / "batch_knockouts"
+        / "knockouts_all.csv",
+        index_col=0,
+    )
+    # exp_ecc_results = pd.read_csv(
+    #     path_to_results
+    #     / "COBRA"
+    #     / "Exp_ECC2"
+    #     / "batch_knockouts"
+    #     / "knockouts_all.csv",
+    #     index_col=0,
+    # )
+
+    df = pd.concat([iml_results, exp_iml_results])
+    # Fix direction to match experimental data
+    # Only for iML1515
+    iml_reversed = ["PGM", "PGK", "SUCOAS"]
+    # fix PGM direction
+    df.loc[df["ID"].isin(iml_reversed), "flux"] = (
+        -1 * df.loc[df["ID"].isin(iml_reversed), "flux"]
+    )
+    df.loc[df["ID"].isin(iml_reversed), "normalized_flux"] = (
+        -1 * df.loc[df["ID"].isin(iml_reversed), "normalized_flux"]
+    )
 
-        kurata_results = load_kurata(
-            sample_names="all",
-            load_path=(path_to_results / "Kurata" / "batch_knockouts"),
-            id_df=kurata_idf,
-            files=get_kurata_batch_kos(),
-            mode="batch",
-        )
+    # df = pd.concat([df, ecc_results, exp_ecc_results])
+    # For both iML1515 and ECC2
+    # fix RPI direction
+    ecc_reversed = ["RPI"]
+    df.loc[df["ID"].isin(ecc_reversed), "flux"] = (
+        -1 * df.loc[df["ID"].isin(ecc_reversed), "flux"]
+    )
+    df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"] = (
+        -1 * df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"]
+    )
 
-        millard_results = load_millard(
-            sample_names="all",
-            load_path=(path_to_results / "Millard" / "batch_knockouts"),
-            id_df=millard_idf,
-            files=get_millard_batch_kos(),
-        )
+    return df
 
-        chassagnole_results = load_chassagnole(
-            sample_names="all",
-            load_path=(path_to_results / "Chassagnole" / "batch_knockouts"),
-            id_df=chassagnole_idf,
-            files=get_chassagnole_kos(),
-        )
 
-        simulation_results = pd.concat(
-            [khodayari_results, kurata_results, millard_results, chassagnole_results], sort=False
-        )
-        return simulation_results
+@instrument.timed("load_batch_ko_data")
+def load_batch_ko_data(cache=True, workers=None):
+    """
+    Load all simulations,
+    parsed files are reused from cache unless cache=False,
+    workers is the number of processes used to parse simulation files
+    """
 
-    def _load_cobra_ko_sims():
+    def _load_kinetic_ko_sims():
         """
-        Load simulations from iML1515, ECC2 and iML1515 and ECC2 conditioned on experimental data
+        Load the data from kinetic models simulations
         """
-        iml_results = pd.read_csv(
-            path_to_results
-            / "COBRA"
-            / "iML1515"
-            / "batch_knockouts"
-            / "knockouts_all.csv",
-            index_col=0,
-        )
-        # ecc_results = pd.read_csv(
-        #     path_to_results
-        #     / "COBRA"
-        #     / "ECC2"
-        #     / "batch_knockouts"
-        #     / "knockouts_all.csv",
-        #     index_col=0,
-        # )
-
-        exp_iml_results = pd.read_csv(
-            path_to_results
-            / "COBRA"
-            / "Exp_iML1515"
-            / "batch_knockouts"
-            / "knockouts_all.csv",
-            index_col=0,
-        )
-        # exp_ecc_results = pd.read_csv(
-        #     path_to_results
-        #     / "COBRA"
-        #     / "Exp_ECC2"
-        #     / "batch_knockouts"
-        #     / "knockouts_all.csv",
-        #     index_col=0,
-        # )
-
-        df = pd.concat([iml_results, exp_iml_results])
-        # Fix direction to match experimental data
-        # Only for iML1515
-        iml_reversed = ["PGM", "PGK", "SUCOAS"]
-        # fix PGM direction
-        df.loc[df["ID"].isin(iml_reversed), "flux"] = (
-            -1 * df.loc[df["ID"].isin(iml_reversed), "flux"]
-        )
-        df.loc[df["ID"].isin(iml_reversed), "normalized_flux"] = (
-            -1 * df.loc[df["ID"].isin(iml_reversed), "normalized_flux"]
+        (
+            khodayari_results,
+            kurata_results,
+            millard_results,
+            chassagnole_results,
+        ) = _run_loaders(
+            [
+                partial(
+                    load_khodayari,
+                    sample_names="all",
+                    load_path=(path_to_results / "Khodayari"),
+                    id_df=get_id_table("Khodayari"),
+                    files=get_khodayari_batch_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_kurata,
+                    sample_names="all",
+                    load_path=(path_to_results / "Kurata" / "batch_knockouts"),
+                    id_df=get_id_table("Kurata"),
+                    files=get_kurata_batch_kos(),
+                    cache=cache,
+                    workers=workers,
+                    mode="batch",
+                ),
+                partial(
+                    load_millard,
+                    sample_names="all",
+                    load_path=(path_to_results / "Millard" / "batch_knockouts"),
+                    id_df=get_id_table("Millard"),
+                    files=get_millard_batch_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+                partial(
+                    load_chassagnole,
+                    sample_names="all",
+                    load_path=(path_to_results / "Chassagnole" / "batch_knockouts"),
+                    id_df=get_id_table("Chassagnole"),
+                    files=get_chassagnole_kos(),
+                    cache=cache,
+                    workers=workers,
+                ),
+            ],
+            workers,
         )
 
-        # df = pd.concat([df, ecc_results, exp_ecc_results])
-        # For both iML1515 and ECC2
-        # fix RPI direction
-        ecc_reversed = ["RPI"]
-        df.loc[df["ID"].isin(ecc_reversed), "flux"] = (
-            -1 * df.loc[df["ID"].isin(ecc_reversed), "flux"]
-        )
-        df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"] = (
-            -1 * df.loc[df["ID"].isin(ecc_reversed), "normalized_flux"]
+        simulation_results = pd.concat(
+            [khodayari_results, kurata_results, millard_results, chassagnole_results], sort=False
         )
+        return simulation_results
 
-        return df
-
-    with io.StringIO() as buf, redirect_stdout(buf):
+    cache = _get_cache(cache)
+    with _get_pool(workers) as workers, instrument.record() as report:
         simulation_data = _load_kinetic_ko_sims()
-        cobra_data = _load_cobra_ko_sims()
-        exp_data = _load_exp_data()
-        file_info = buf.getvalue()
+        cobra_data = _load_cobra_batch_ko_sims(cache)
+        exp_data = _load_experimental_batch_ko_data(cache)
+        file_info = report.text()
     return pd.concat([simulation_data, cobra_data, exp_data], sort=False), file_info
+
+
+def iter_batch_ko_data(cache=True):
+    """
+    Generator version of load_batch_ko_data, yields (author, sample_id, dataframe)
+    for one sample at a time, see iter_ko_data
+    """
+    cache = _get_cache(cache)
+    yield from iter_khodayari(
+        sample_names="all",
+        load_path=(path_to_results / "Khodayari"),
+        id_df=get_id_table("Khodayari"),
+        files=get_khodayari_batch_kos(),
+        cache=cache,
+    )
+    yield from iter_kurata(
+        sample_names="all",
+        load_path=(path_to_results / "Kurata" / "batch_knockouts"),
+        id_df=get_id_table("Kurata"),
+        files=get_kurata_batch_kos(),
+        mode="batch",
+        cache=cache,
+    )
+    yield from iter_millard(
+        sample_names="all",
+        load_path=(path_to_results / "Millard" / "batch_knockouts"),
+        id_df=get_id_table("Millard"),
+        files=get_millard_batch_kos(),
+        cache=cache,
+    )
+    yield from iter_chassagnole(
+        sample_names="all",
+        load_path=(path_to_results / "Chassagnole" / "batch_knockouts"),
+        id_df=get_id_table("Chassagnole"),
+        files=get_chassagnole_kos(),
+        cache=cache,
+    )
+    yield from _iter_samples(
+        _load_cobra_batch_ko_sims(cache), _load_experimental_batch_ko_data(cache)
+    )
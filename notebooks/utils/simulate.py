@@ -0,0 +1,655 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import instrument
+from .cache import _file_sha1
+from .ids import data_path, get_id_table
+from .utils import get_millard_rules, get_chassagnole_rules, _reaction_rules
+
+
+# Simulations of SBML models (Millard, Chassagnole) with tellurium / roadrunner.
+# Fluxes are saved as ID,Value csv files read by utils.load_millard and
+# utils.load_chassagnole.
+
+# converted and compiled models are kept here between sessions, see load_sbml_model
+model_cache_path = data_path / ".cache" / "models"
+# part of the key of compiled models, increase when the saved state changes
+model_cache_version = 2
+
+# exceptions of roadrunner solvers: failures of NLEQ / CVODE are RuntimeError,
+# invalid values (e.g. negative concentrations) ValueError and overflows
+# of the solution ArithmeticError, all of them fall back to integration
+_solver_errors = (RuntimeError, ValueError, ArithmeticError)
+
+# models loaded in this process by path, so every worker compiles a model only once
+_models = {}
+
+
+def get_millard_ko_experiments():
+    return [
+        {"sample_id": "Delta_tpi", "modifications": ["TPI_Vmax"]},
+        {"sample_id": "Delta_aAkgdh", "modifications": ["LPD_Vmax"]},
+        {"sample_id": "Delta_fba", "modifications": ["FBA_Vmax"]},
+        {"sample_id": "Delta_zwf", "modifications": ["ZWF_Vmax"]},
+        {"sample_id": "Delta_pts", "modifications": ["PTS_4_kF", "PTS_4_kR"]},
+        {"sample_id": "Delta_gnd", "modifications": ["GND_Vmax"]},
+        {"sample_id": "Delta_pfk", "modifications": ["PFK_Vmax"]},
+        {"sample_id": "Delta_pgi", "modifications": ["PGI_Vmax"]},
+        {"sample_id": "Delta_pgl", "modifications": ["PGL_Vmax"]},
+        {"sample_id": "Delta_pps", "modifications": ["PPS_Vmax"]},
+        {"sample_id": "Delta_pyk", "modifications": ["PYK_Vmax"]},
+        {"sample_id": "Delta_rpe", "modifications": ["RPE_Vmax"]},
+        {"sample_id": "Delta_rpi", "modifications": ["RPI_Vmax"]},
+        {"sample_id": "Delta_sdh", "modifications": ["SDH_Vmax"]},
+        {
+            "sample_id": "Delta_tal",
+            "modifications": ["F6P_GAP_TAL_kcat", "S7P_E4P_TAL_kcat"],
+        },
+        {
+            "sample_id": "Delta_tkt1",
+            "modifications": ["X5P_GAP_TKT_kcat", "S7P_R5P_TKT_kcat"],
+        },
+        {"sample_id": "Delta_tkt2", "modifications": ["F6P_E4P_TKT_kcat"]},
+        {"sample_id": "Delta_fbp", "modifications": ["FBP_Vmax"]},
+    ]
+
+
+def get_chassagnole_ko_experiments():
+    return [
+        {"sample_id": "Delta_tpi", "modifications": ["vTIS_rmaxTIS"]},
+        {"sample_id": "Delta_fba", "modifications": ["vALDO_rmaxALDO"]},
+        {"sample_id": "Delta_zwf", "modifications": ["vG6PDH_rmaxG6PDH"]},
+        {"sample_id": "Delta_gnd", "modifications": ["vPGDH_rmaxPGDH"]},
+        {"sample_id": "Delta_pfk", "modifications": ["vPFK_rmaxPFK"]},
+        {"sample_id": "Delta_pgi", "modifications": ["vPGI_rmaxPGI"]},
+        {"sample_id": "Delta_pyk", "modifications": ["vPK_rmaxPK"]},
+        {"sample_id": "Delta_rpe", "modifications": ["vRu5P_rmaxRu5P"]},
+        {"sample_id": "Delta_rpi", "modifications": ["vR5PI_rmaxR5PI"]},
+        {"sample_id": "Delta_tal", "modifications": ["vTA_rmaxTA"]},
+        {"sample_id": "Delta_tkt1", "modifications": ["vTKA_rmaxTKa"]},
+        {"sample_id": "Delta_tkt2", "modifications": ["vTKB_rmaxTKb"]},
+    ]
+
+
+def _import_tellurium():
+    try:
+        import tellurium as te
+    except ImportError:
+        raise ImportError("tellurium is required to simulate SBML models")
+    return te
+
+
+def _import_roadrunner():
+    try:
+        import roadrunner
+    except ImportError:
+        raise ImportError("tellurium is required to simulate SBML models")
+    return roadrunner
+
+
+def _load_cached_model(cache_dir):
+    roadrunner = _import_roadrunner()
+
+    model = roadrunner.RoadRunner()
+    model.loadState(str(cache_dir / "model.rr"))
+    return model
+
+
+def _write_atomic(path, write):
+    """
+    Calls write with a unique temporary path next to path and renames it to path,
+    so processes compiling the same model never read or replace partial files
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _compile_model(model_path, cache_dir=None):
+    """
+    Converts SBML to Antimony and back and compiles it with roadrunner,
+    saves the converted model and roadrunner state to cache_dir
+    """
+    te = _import_tellurium()
+    antimony = te.sbmlToAntimony(str(model_path))
+    model = te.loadAntimonyModel(antimony)
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sbml = model.getCurrentSBML()
+        _write_atomic(cache_dir / "model.ant", lambda p: Path(p).write_text(antimony))
+        _write_atomic(cache_dir / "model.xml", lambda p: Path(p).write_text(sbml))
+        _write_atomic(cache_dir / "model.rr", lambda p: model.saveState(str(p)))
+    return model
+
+
+def load_sbml_model(model_path, cache=True):
+    """
+    Loads SBML model with tellurium, loading as Antimony bypasses the lack of
+    ability to change local parameters in native SBML model.
+    Converted model and compiled roadrunner state are cached by the hash of the file
+    and roadrunner version, so later loads (e.g. in every worker process) restore
+    the state with loadState instead of converting and compiling the model again.
+    params:
+    :model_path - path to SBML file
+    :cache - True for the default cache directory, path to other directory
+      or False to always compile the model
+    """
+    cache_dir = None
+    if cache:
+        roadrunner = _import_roadrunner()
+        cache_root = model_cache_path if cache is True else Path(cache)
+        key = (
+            f"{_file_sha1(model_path)}-{roadrunner.__version__}"
+            f"-v{model_cache_version}"
+        )
+        cache_dir = cache_root / key
+
+    with instrument.span("load_model", name=Path(model_path).name) as event:
+        if cache_dir is not None and (cache_dir / "model.rr").exists():
+            try:
+                model = _load_cached_model(cache_dir)
+                event["message"] = f"Loaded compiled model {Path(model_path).name}"
+                return model
+            except Exception as error:
+                # state saved by a different build of roadrunner or a broken file,
+                # the entry is dropped and replaced by the compiled model
+                instrument.log(f"Unable to load compiled model {cache_dir}: {error}")
+                try:
+                    os.remove(cache_dir / "model.rr")
+                except FileNotFoundError:
+                    pass
+        return _compile_model(model_path, cache_dir)
+
+
+def apply_modifications(model, modifications=(), scale=0, settings=None):
+    """
+    Resets the model to the original state and applies the perturbation
+    params:
+    :model - roadrunner model
+    :modifications - list of parameters (Vmax, kcat) to perturb
+    :scale - factor the parameters are multiplied by,
+      0 is the poor-mans 'knockout', 15 is 15x overexpression
+    :settings - dict parameter -> value set before perturbation, e.g. {"FEED": 0.4}
+    """
+    model.resetToOrigin()
+    for parameter, value in (settings or {}).items():
+        model.setValue(parameter, value)
+    for parameter in modifications:
+        model.setValue(parameter, model.getValue(parameter) * scale)
+
+
+def steady_state_residual(model):
+    """
+    Returns the largest absolute rate of change of floating species
+    """
+    rates = np.asarray(model.getRatesOfChange(), dtype=float)
+    return float(np.max(np.abs(rates))) if rates.size else 0.0
+
+
+def get_state(model):
+    """
+    Returns concentrations of floating species of the model
+    """
+    return np.array(model.getFloatingSpeciesConcentrations(), dtype=float)
+
+
+def set_state(model, state):
+    """
+    Sets concentrations of floating species returned by get_state.
+    With conserved moiety analysis only independent species are set, dependent
+    ones follow from the moiety totals of the model, which are the same for
+    states of the same model with different kinetic parameters (e.g. steps
+    of sweep_parameter)
+    """
+    species_ids = model.getFloatingSpeciesIds()
+    if model.conservedMoietyAnalysis:
+        independent = set(model.getIndependentFloatingSpeciesIds())
+    else:
+        independent = set(species_ids)
+    for species_id, value in zip(species_ids, state):
+        if species_id in independent:
+            model.setValue(f"[{species_id}]", value)
+
+
+def integrate_to_steady_state(
+    model, end_time=10000, tolerance=1e-6, chunks=100, window=5
+):
+    """
+    Integrates the model in chunks of end_time / chunks and stops once the rate of
+    change (see steady_state_residual) stays under tolerance for window chunks,
+    end_time is the upper bound as in the long integration used before.
+    Returns time at which the steady state was reached (end of the first chunk
+    of the window) or None if window chunks under tolerance were not completed
+    before end_time.
+    params:
+    :model - roadrunner model with perturbation applied
+    :end_time - largest integration time
+    :tolerance - largest rate of change accepted as steady state
+    :chunks - number of chunks end_time is split into
+    :window - number of consecutive chunks under tolerance needed to stop
+    """
+    times = np.linspace(0, end_time, chunks + 1)
+    steady_time = None
+    steady_chunks = 0
+    for start, end in zip(times[:-1], times[1:]):
+        model.simulate(start, end, 2)
+        if steady_state_residual(model) > tolerance:
+            steady_time = None
+            steady_chunks = 0
+            continue
+        if steady_time is None:
+            steady_time = end
+        steady_chunks += 1
+        if steady_chunks >= window:
+            return steady_time
+    return None
+
+
+def _switch_moiety_analysis(model, value):
+    """
+    roadrunner regenerates the model when conserved moiety analysis is switched,
+    so the current parameters and concentrations are set again afterwards
+    """
+    parameter_ids = list(model.getGlobalParameterIds())
+    values = np.array(model.getGlobalParameterValues(), dtype=float)
+    state = get_state(model)
+    model.conservedMoietyAnalysis = value
+    set_state(model, state)
+    current = np.array(model.getGlobalParameterValues(), dtype=float)
+    for i in np.flatnonzero((current != values) & ~np.isnan(values)):
+        model.setValue(parameter_ids[i], values[i])
+
+
+@contextmanager
+def _moiety_analysis(model):
+    """
+    Enables conserved moiety analysis for the steady state solver (it needs
+    independent species only) and disables it again, so integration runs
+    on the full model as in the notebooks
+    """
+    if model.conservedMoietyAnalysis:
+        yield
+        return
+    _switch_moiety_analysis(model, True)
+    try:
+        yield
+    finally:
+        _switch_moiety_analysis(model, False)
+
+
+def _valid_steady_state(model, tolerance):
+    """
+    Returns largest rate of change and whether the solution of the solver is a
+    steady state with finite rates and finite non-negative concentrations
+    """
+    residual = steady_state_residual(model)
+    concentrations = get_state(model)
+    rates = np.asarray(model.getReactionRates(), dtype=float)
+    valid = (
+        residual <= tolerance
+        and np.isfinite(rates).all()
+        and np.isfinite(concentrations).all()
+        and (concentrations >= -tolerance).all()
+    )
+    return residual, valid
+
+
+def simulate_fluxes(
+    model, end_time=10000, method="steady_state", tolerance=1e-6, warm_start=False
+):
+    """
+    Returns reaction rates of the model at steady state.
+    The steady state solver (NLEQ) is tried first with conserved moiety analysis,
+    if it fails or the solution is not stationary (see steady_state_residual)
+    or has negative or infinite concentrations, the model is integrated
+    from the initial state (or the current state if warm_start) to end_time
+    as before, without conserved moiety analysis.
+    Returns pd.DataFrame with ID and Value of every reaction and dict with
+    method used ("steady_state", "integration" or "early_stop"), residual,
+    steady_time (time at which early_stop integration reached steady state)
+    and seconds.
+    params:
+    :model - roadrunner model with perturbation applied
+    :end_time - length of the fallback integration
+    :method - "steady_state" to try the solver first, "integration" to skip it,
+      "early_stop" to integrate until the steady state is reached,
+      see integrate_to_steady_state
+    :tolerance - largest rate of change accepted as steady state
+    :warm_start - start from the current state of the model instead of the initial
+      one, e.g. the steady state of a close perturbation (see sweep_parameter)
+    """
+    if method not in ("steady_state", "integration", "early_stop"):
+        raise ValueError(
+            f"Unknown method {method}, use steady_state, integration or early_stop"
+        )
+
+    start = time.perf_counter()
+    residual = np.inf
+    steady_time = None
+    if method == "steady_state":
+        if warm_start:
+            state = get_state(model)
+        with _moiety_analysis(model):
+            try:
+                model.steadyState()
+                residual, valid = _valid_steady_state(model, tolerance)
+            except _solver_errors:
+                residual, valid = np.inf, False
+        if not valid:
+            # the solver failed or converged to a non-stationary or
+            # non-physical point (negative or infinite concentrations)
+            method = "integration"
+            if warm_start:
+                set_state(model, state)
+            else:
+                model.reset()
+
+    if method == "integration":
+        model.simulate(0, end_time)
+        residual = steady_state_residual(model)
+    elif method == "early_stop":
+        steady_time = integrate_to_steady_state(model, end_time, tolerance)
+        residual = steady_state_residual(model)
+
+    fluxes = pd.DataFrame(
+        {"ID": model.getReactionIds(), "Value": model.getReactionRates()}
+    )
+    info = {
+        "method": method,
+        "residual": residual,
+        "steady_time": np.NaN if steady_time is None else steady_time,
+        "seconds": time.perf_counter() - start,
+    }
+    return fluxes, info
+
+
+def _get_model(model_path):
+    key = str(Path(model_path).resolve())
+    if key not in _models:
+        _models[key] = load_sbml_model(key)
+    return _models[key]
+
+
+def _run_experiment(
+    model, experiment, save_path, file_name, settings, end_time, method, tolerance
+):
+    """
+    Simulates a single experiment, model is roadrunner model or path to SBML file
+    loaded once per process
+    """
+    if isinstance(model, (str, Path)):
+        model = _get_model(model)
+    sample_id = experiment["sample_id"]
+    with instrument.span("simulate", sample_id=sample_id) as event:
+        apply_modifications(
+            model,
+            experiment.get("modifications", ()),
+            experiment.get("scale", 0),
+            settings,
+        )
+        fluxes, info = simulate_fluxes(model, end_time, method, tolerance)
+        event["rows"] = len(fluxes)
+    instrument.log(
+        f"Simulated sample {sample_id} with {info['method']}, "
+        f"residual {info['residual']:.2e}"
+    )
+    if save_path is not None:
+        fluxes.to_csv(Path(save_path) / file_name.format(sample_id=sample_id))
+    return fluxes.assign(sample_id=sample_id), {"sample_id": sample_id, **info}
+
+
+def run_experiments(
+    model,
+    experiments,
+    save_path=None,
+    file_name="{sample_id}.csv",
+    settings=None,
+    end_time=10000,
+    method="steady_state",
+    tolerance=1e-6,
+    workers=None,
+):
+    """
+    Simulates every experiment and saves the fluxes as csv files.
+    Returns pd.DataFrame of fluxes with sample_id, ID and Value columns
+    and pd.DataFrame with sample_id, method, residual and seconds of every run.
+    params:
+    :model - path to SBML file or roadrunner model, see load_sbml_model
+    :experiments - list of dicts with sample_id, modifications and optional scale
+      (0 by default), see get_millard_ko_experiments and apply_modifications
+    :save_path - directory to save results to, None to skip saving
+    :file_name - name of the result file, formatted with sample_id
+    :settings - parameters set for every experiment, e.g. {"FEED": 0.4}
+    :end_time, method, tolerance - see simulate_fluxes
+    :workers - number of worker processes or Executor to run experiments in
+      parallel, model has to be a path then and is loaded once by every worker,
+      None to run them one by one
+    """
+    jobs = [
+        (model, experiment, save_path, file_name, settings, end_time, method, tolerance)
+        for experiment in experiments
+    ]
+    if workers is None or len(jobs) < 2:
+        results = [_run_experiment(*job) for job in jobs]
+    else:
+        if not isinstance(model, (str, Path)):
+            raise ValueError("model has to be a path to run experiments in workers")
+        if isinstance(workers, Executor):
+            pool = workers
+        else:
+            pool = ProcessPoolExecutor(workers)
+        try:
+            # events recorded in workers are sent back with the results
+            memory = instrument._memory()
+            futures = [
+                pool.submit(instrument.run_recorded, _run_experiment, job, memory)
+                for job in jobs
+            ]
+            results = []
+            for future in futures:
+                result, events = future.result()
+                instrument.replay(events)
+                results.append(result)
+        finally:
+            if pool is not workers:
+                pool.shutdown()
+
+    fluxes = pd.concat([result[0] for result in results], ignore_index=True)
+    runs = pd.DataFrame([result[1] for result in results])
+    return fluxes[["sample_id", "ID", "Value"]], runs
+
+
+def sweep_parameter(
+    model,
+    parameters,
+    scales=np.linspace(0, 5, 200),
+    name=None,
+    settings=None,
+    end_time=10000,
+    tolerance=1e-6,
+    save_path=None,
+    file_name="{sample_id}.csv",
+):
+    """
+    Dose-response of the model to the scale of parameters (e.g. vPGI_rmaxPGI, PGI_Vmax)
+    by continuation: scales are walked from the one closest to the original value
+    up and then down, and every steady state solve starts from the steady state
+    of the previous scale, so each point costs about one solve.
+    Returns pd.DataFrame of fluxes with sample_id, scale, ID and Value columns
+    and pd.DataFrame with sample_id, scale, method, residual and seconds of every point.
+    params:
+    :model - roadrunner model, see load_sbml_model
+    :parameters - list of parameters scaled together
+    :scales - grid of factors the original parameter values are multiplied by
+    :name - sample_id is formatted as name(scale), first parameter by default
+    :settings - parameters set before the sweep, e.g. {"FEED": 0.4}
+    :end_time, tolerance - see simulate_fluxes
+    :save_path, file_name - see run_experiments
+    """
+    name = name or parameters[0]
+    scales = np.sort(np.asarray(scales, dtype=float))
+    apply_modifications(model, (), settings=settings)
+    original = {parameter: model.getValue(parameter) for parameter in parameters}
+
+    # the original model is the best known starting point,
+    # walk to larger scales first and restart from it to walk to smaller ones
+    start = int(np.argmin(np.abs(scales - 1)))
+    order = list(range(start, len(scales))) + list(range(start - 1, -1, -1))
+    fluxes = []
+    runs = []
+    for i in order:
+        scale = scales[i]
+        sample_id = f"{name}({scale:.4g})"
+        if i == start - 1:
+            set_state(model, start_state)
+        with instrument.span("simulate", sample_id=sample_id) as event:
+            for parameter, value in original.items():
+                model.setValue(parameter, value * scale)
+            flux, info = simulate_fluxes(
+                model, end_time, tolerance=tolerance, warm_start=i != start
+            )
+            event["rows"] = len(flux)
+        if i == start:
+            start_state = get_state(model)
+        if save_path is not None:
+            flux.to_csv(Path(save_path) / file_name.format(sample_id=sample_id))
+        fluxes.append(flux.assign(sample_id=sample_id, scale=scale))
+        runs.append({"sample_id": sample_id, "scale": scale, **info})
+    instrument.log(
+        f"Swept {name} over {len(scales)} scales, "
+        f"{sum(run['method'] == 'integration' for run in runs)} needed integration"
+    )
+
+    fluxes = pd.concat(fluxes, ignore_index=True).sort_values("scale", kind="stable")
+    runs = pd.DataFrame(runs).sort_values("scale", kind="stable")
+    return (
+        fluxes[["sample_id", "scale", "ID", "Value"]].reset_index(drop=True),
+        runs.reset_index(drop=True),
+    )
+
+
+def _rate_derivatives(model, parameters, step=1e-4):
+    """
+    Returns derivatives of reaction rates by ln(parameter) at the current state
+    as (reaction, parameter) array, central differences need two rate evaluations
+    per parameter and no steady state
+    """
+    derivatives = np.empty((len(model.getReactionIds()), len(parameters)))
+    for i, parameter in enumerate(parameters):
+        value = model.getValue(parameter)
+        rates = []
+        for factor in (1 + step, 1 - step):
+            model.setValue(parameter, value * factor)
+            rates.append(np.asarray(model.getReactionRates(), dtype=float))
+        model.setValue(parameter, value)
+        derivatives[:, i] = (rates[0] - rates[1]) / (2 * step)
+    return derivatives
+
+
+def control_coefficients(
+    model, author, parameters=(), settings=None, end_time=10000, tolerance=1e-6
+):
+    """
+    Local sensitivities of all fluxes at the WT steady state from metabolic control
+    analysis instead of perturbation runs: scaled flux control coefficients of every
+    reaction (sample_id is the perturbed reaction, coefficient "control") and
+    scaled response coefficients of parameters (sample_id is the parameter,
+    coefficient "response").
+    Fluxes are mapped to BiGG IDs with the rules used by utils.load_millard
+    and utils.load_chassagnole, so flux_coefficient is the coefficient of the flux
+    and normalized_flux_coefficient the coefficient of the flux normalized
+    by glucose uptake, i.e. relative change of normalized_flux per relative
+    change of the enzyme.
+    Returns pd.DataFrame with ID, BiGG_ID, author, sample_id, coefficient,
+    flux_coefficient and normalized_flux_coefficient columns and dict with
+    the steady state info (see simulate_fluxes).
+    Raises RuntimeError if the steady state solver fails, control coefficients
+    are not defined for the state reached by integration.
+    params:
+    :model - roadrunner model, see load_sbml_model
+    :author - Millard or Chassagnole
+    :parameters - parameters to compute response coefficients for, e.g. PGI_Vmax
+    :settings - parameters set before the analysis, e.g. {"FEED": 0.4}
+    :end_time, tolerance - see simulate_fluxes
+    """
+    if author == "Millard":
+        rules = get_millard_rules()
+    elif author == "Chassagnole":
+        rules = get_chassagnole_rules()
+    else:
+        raise ValueError(f"Control coefficients are not available for {author}")
+
+    with instrument.span("mca", name=author) as event:
+        apply_modifications(model, (), settings=settings)
+        fluxes, info = simulate_fluxes(model, end_time, tolerance=tolerance)
+        if info["method"] != "steady_state":
+            raise RuntimeError(
+                f"Steady state solver failed for {author} (residual "
+                f"{info['residual']:.3g}), control coefficients are not available"
+            )
+        reaction_ids = list(fluxes["ID"])
+        flux = fluxes["Value"].values
+        # rows are fluxes and columns are perturbed reactions,
+        # unscaled coefficients do not divide by zero fluxes
+        with _moiety_analysis(model):
+            control = np.asarray(model.getUnscaledFluxControlCoefficientMatrix())
+        # derivatives d flux / d ln(parameter) of every row, response R = C elasticity
+        # needs only the rates of the perturbed parameters, not a steady state each
+        derivative = np.vstack(
+            [
+                (control * flux).T,
+                (control @ _rate_derivatives(model, parameters)).T,
+            ]
+        )
+        sample_ids = reaction_ids + list(parameters)
+
+        # derivatives are linear in the rules, unlike the scaled coefficients
+        flux_rules, _ = _reaction_rules(
+            rules, pd.Series(flux, index=reaction_ids), get_id_table(author)
+        )
+        uptake = np.isin(flux_rules.ids, rules[-1]["ids"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # normalize_by rules divide derivatives by zero fluxes
+            rule_flux, _ = flux_rules.apply(flux)
+            rule_derivative, _ = flux_rules.apply(derivative)
+            coefficient = rule_derivative / rule_flux
+            uptake_coefficient = (
+                rule_derivative[:, uptake].sum(axis=1) / rule_flux[:, uptake].sum()
+            )
+        normalized_coefficient = coefficient - uptake_coefficient[:, None]
+        coefficient[~np.isfinite(coefficient)] = np.NaN
+        normalized_coefficient[~np.isfinite(normalized_coefficient)] = np.NaN
+
+        n_samples, n_reactions = coefficient.shape
+        kinds = ["control"] * len(reaction_ids) + ["response"] * len(parameters)
+        df = pd.DataFrame(
+            {
+                "ID": np.tile(flux_rules.ids, n_samples),
+                "BiGG_ID": np.tile(flux_rules.bigg_ids, n_samples),
+                "author": author,
+                "sample_id": np.repeat(
+                    np.asarray(sample_ids, dtype=object), n_reactions
+                ),
+                "coefficient": np.repeat(kinds, n_reactions),
+                "flux_coefficient": coefficient.ravel(),
+                "normalized_flux_coefficient": normalized_coefficient.ravel(),
+            },
+            index=np.tile(np.arange(n_reactions), n_samples),
+        )
+        event["rows"] = len(df)
+    return df, info
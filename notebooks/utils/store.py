@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+from .ids import data_path
+from .load import (
+    load_ko_data,
+    load_dilution_data,
+    load_sensitivity_data,
+    load_batch_ko_data,
+)
+
+
+# Consolidated flux results, see export_store
+store_path = data_path / "flux_store"
+
+_index_name = "index.json"
+_float_columns = ["flux", "normalized_flux"]
+_string_columns = ["author", "sample_id", "ID", "BiGG_ID"]
+# stored only if some of the experiments have them, NaN for the other rows
+_optional_columns = ["sampling_time", "normalized_flux_error"]
+
+
+def _load_experiments(cache=True, workers=None, errors=False):
+    """
+    Returns dict experiment name -> tidy dataframe as returned by utils.load
+    """
+    sensitivity, _ = load_sensitivity_data(cache=cache, workers=workers)
+    return {
+        "ko": load_ko_data(cache=cache, workers=workers, errors=errors)[0],
+        "dilution": load_dilution_data(cache=cache, workers=workers)[0],
+        "zwf": sensitivity[0],
+        "pgi": sensitivity[1],
+        "eno": sensitivity[2],
+        "batch_ko": load_batch_ko_data(cache=cache, workers=workers)[0],
+    }
+
+
+def export_store(path=store_path, cache=True, workers=None, errors=False):
+    """
+    Consolidates results of all experiments (kinetic and COBRA simulations together
+    with experimental fluxes) into a columnar store of .npy files.
+    Rows are grouped by experiment and author, so every group is a contiguous slice
+    which can be read zero-copy from memory mapped columns, see FluxStore.
+    Text columns are saved as integer codes, their categories are kept in index.json.
+    sampling_time and normalized_flux_error are stored as float columns
+    when any of the experiments has them.
+    params:
+    :path - directory of the store, replaced if it already exists
+    :cache, workers - passed to utils.load functions
+    :errors - keep standard deviations of experimental fluxes,
+      see load_ko_data
+    """
+    path = Path(path)
+    experiments = _load_experiments(cache=cache, workers=workers, errors=errors)
+
+    frames = []
+    groups = {}
+    start = 0
+    for experiment, df in experiments.items():
+        groups[experiment] = {}
+        for author, author_df in df.groupby("author", sort=False):
+            groups[experiment][author] = [start, start + len(author_df)]
+            start += len(author_df)
+            frames.append(author_df)
+    data = pd.concat(frames, sort=False)
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    categories = {}
+    for column in _string_columns:
+        codes, uniques = pd.factorize(data[column])
+        np.save(tmp_path / f"{column}.npy", codes.astype(np.int32))
+        categories[column] = uniques.tolist()
+    float_columns = _float_columns + [x for x in _optional_columns if x in data]
+    for column in float_columns:
+        values = pd.to_numeric(data[column], errors="coerce")
+        np.save(tmp_path / f"{column}.npy", values.to_numpy(dtype=np.float64))
+
+    index = {
+        "n_rows": len(data),
+        "groups": groups,
+        "categories": categories,
+        "float_columns": float_columns,
+    }
+    (tmp_path / _index_name).write_text(json.dumps(index, indent=1))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return FluxStore(path)
+
+
+class FluxStore:
+    """
+    Read-only access to the store written by export_store.
+    Columns are memory mapped on first use, so opening the store only reads index.json.
+    params:
+    :path - directory of the store
+    """
+
+    def __init__(self, path=store_path):
+        self.path = Path(path)
+        index = json.loads((self.path / _index_name).read_text())
+        self.n_rows = index["n_rows"]
+        self.groups = index["groups"]
+        self.categories = index["categories"]
+        self.float_columns = index.get("float_columns", _float_columns)
+        self._columns = {}
+
+    @property
+    def experiments(self):
+        return list(self.groups)
+
+    def authors(self, experiment):
+        return list(self.groups[experiment])
+
+    def _slice(self, experiment=None, author=None):
+        """
+        Returns slice of rows for the experiment and author (all rows if None)
+        """
+        if experiment is None:
+            return slice(0, self.n_rows)
+        if experiment not in self.groups:
+            raise ValueError(f"Unknown experiment {experiment}")
+        ranges = self.groups[experiment]
+        if author is None:
+            bounds = list(ranges.values())
+            return slice(bounds[0][0], bounds[-1][1]) if bounds else slice(0, 0)
+        if author not in ranges:
+            raise ValueError(f"No data for {author} in {experiment}")
+        return slice(*ranges[author])
+
+    def column(self, name, experiment=None, author=None):
+        """
+        Returns read-only memory mapped view of the column (no data is copied).
+        Text columns are returned as integer codes into self.categories[name],
+        -1 marks missing values.
+        """
+        if name not in self._columns:
+            if name not in self.float_columns + _string_columns:
+                raise ValueError(f"Unknown column {name}")
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._columns[name][self._slice(experiment, author)]
+
+    def to_frame(self, experiment=None, author=None):
+        """
+        Returns tidy dataframe with the same columns as utils.load functions
+        for the experiment and author (all of them if None)
+        """
+        data = {}
+        for name in self.float_columns:
+            data[name] = np.asarray(self.column(name, experiment, author))
+        for name in _string_columns:
+            codes = np.asarray(self.column(name, experiment, author))
+            values = np.array(self.categories[name] + [np.nan], dtype=object)
+            data[name] = values[codes]
+        columns = ["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]
+        return pd.DataFrame(data)[columns + self.float_columns[2:]]
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import json
+
+import numpy as np
+import pandas as pd
+import scipy.io as sio
+
+from pathlib import Path
+
+from . import instrument
+from .ids import get_common_fluxes, get_id_table
+from .load import _load_experimental_ko_data
+from .utils import (
+    get_khodayari_rules,
+    get_kurata_rules,
+    get_millard_rules,
+    get_chassagnole_rules,
+    load_khodayari,
+    load_kurata,
+    load_millard,
+    load_chassagnole,
+)
+
+
+_manifest_name = "dataset.json"
+
+# reactions the models are normalized by have to carry positive flux
+_uptake_ids = {
+    "Khodayari": get_khodayari_rules()[-1]["ids"],
+    "Kurata": get_kurata_rules()[-1]["ids"],
+    "Millard": get_millard_rules()[-1]["ids"],
+    "Chassagnole": get_chassagnole_rules()[-1]["ids"],
+}
+
+
+def synthetic_id_table(author, n_extra_reactions=0):
+    """
+    Returns ID table of the model extended by n_extra_reactions synthetic reactions
+    SYN_0, SYN_1, ... which have the same model and BiGG ID
+    """
+    id_df = get_id_table(author)
+    if author == "Kurata":
+        # Kurata FLUX has a column per unique model ID, see load_kurata
+        id_df = id_df.drop_duplicates(subset="ID")
+    extra_ids = [f"SYN_{i}" for i in range(n_extra_reactions)]
+    extra = pd.DataFrame({"ID": extra_ids, "BiGG ID": extra_ids})
+    return pd.concat([id_df, extra], ignore_index=True, sort=False)
+
+
+def _base_fluxes(rng, id_df, author):
+    flux = rng.lognormal(0, 1, len(id_df)) * rng.choice([-1, 1], len(id_df))
+    uptake = id_df["ID"].isin(_uptake_ids[author]).values
+    flux[uptake] = abs(flux[uptake])
+    return flux
+
+
+def _write_khodayari(file_path, flux, n_time_points):
+    # reactions are rows and time points are columns of Vnet
+    vnet = np.tile(flux[:, None], (1, n_time_points))
+    sio.savemat(file_path, {"Vnet": vnet}, do_compression=True)
+
+
+def _write_kurata(file_path, flux, n_time_points):
+    # time points are rows and reactions are columns of FLUX
+    sio.savemat(
+        file_path, {"FLUX": np.tile(flux, (n_time_points, 1))}, do_compression=True
+    )
+
+
+def _write_reaction_rates(file_path, flux, id_df):
+    pd.DataFrame({"ID": id_df["ID"].values, "Value": flux}).to_csv(file_path)
+
+
+def _write_experimental(file_path, sample_names, rng, uptake=10.0):
+    """
+    Tidy experimental dataset in the same format as data/datasets/*_tidy.csv
+    with every common flux measured in every sample
+    """
+    bigg_ids = sorted(get_common_fluxes())
+    n = len(bigg_ids)
+    normalized_flux = rng.lognormal(3, 1, (len(sample_names), n)).ravel()
+    normalized_error = 0.1 * normalized_flux
+    genotypes = ["WT" if s == "WT" else f"d{s}" for s in sample_names]
+    df = pd.DataFrame(
+        {
+            "Strain": "BW25113",
+            "Genotype": np.repeat(genotypes, n),
+            "Medium": "GLC",
+            "Dilution": np.nan,
+            "Measurement_Type": "flux",
+            "Time": np.nan,
+            "Measurement_ID": np.tile(bigg_ids, len(sample_names)),
+            "Original_ID": np.tile(bigg_ids, len(sample_names)),
+            "Value": normalized_flux * uptake / 100,
+            "Original_Value": normalized_flux,
+            "Unit": "mmol/h/gDW",
+            "Original_Unit": "relative to glucose uptake",
+            "Error": normalized_error * uptake / 100,
+            "Original_Error": normalized_error,
+            "Source": "synthetic",
+        }
+    )
+    df.to_csv(file_path, index=False)
+
+
+def write_synthetic_dataset(
+    path,
+    n_samples=1000,
+    n_extra_reactions=0,
+    noise=0.2,
+    n_time_points=None,
+    seed=None,
+):
+    """
+    Writes synthetic knockout simulations of all kinetic models in the formats
+    read by utils.load (Khodayari and Kurata mat files, Millard and Chassagnole
+    csv files), their ID tables and tidy experimental data.
+    Every sample is a random perturbation of a random base flux vector of the model.
+    Returns description of the dataset, see load_synthetic_ko_data.
+    params:
+    :path - directory to write the dataset to
+    :n_samples - number of perturbations, WT is added on top of them
+    :n_extra_reactions - number of synthetic reactions added to each model
+    :noise - standard deviation of log-normal perturbations of base fluxes
+    :n_time_points - number of integration points, by default 2 for Khodayari
+      and 2101 for Kurata (fluxes are read from the last row of FLUX)
+    :seed - seed of the random generator
+    """
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    sample_names = ["WT"] + [f"syn{i}" for i in range(n_samples)]
+    n_time_points = n_time_points or {"Khodayari": 2, "Kurata": 2101}
+
+    dataset = {"files": {}, "id_files": {}, "experimental": "synthetic_tidy.csv"}
+    for author in ["Khodayari", "Kurata", "Millard", "Chassagnole"]:
+        (path / author).mkdir(parents=True, exist_ok=True)
+        id_df = synthetic_id_table(author, n_extra_reactions)
+        id_file = f"{author.lower()}_id.csv"
+        id_df.to_csv(path / id_file, index=False)
+        dataset["id_files"][author] = id_file
+
+        base = _base_fluxes(rng, id_df, author)
+        files = {}
+        for sample_id in sample_names:
+            flux = base * rng.lognormal(0, noise, len(base))
+            if author in ("Khodayari", "Kurata"):
+                files[sample_id] = f"result_cont_{sample_id}.mat"
+                write = _write_khodayari if author == "Khodayari" else _write_kurata
+                write(path / author / files[sample_id], flux, n_time_points[author])
+            else:
+                files[sample_id] = f"{author}_result_{sample_id}.csv"
+                _write_reaction_rates(path / author / files[sample_id], flux, id_df)
+        dataset["files"][author] = files
+
+    _write_experimental(path / dataset["experimental"], sample_names, rng)
+    (path / _manifest_name).write_text(json.dumps(dataset, indent=1))
+    return dataset
+
+
+def get_synthetic_files(path, author):
+    """
+    Returns files dictionary of the model like get_khodayari_kos()
+    """
+    dataset = json.loads((Path(path) / _manifest_name).read_text())
+    return dataset["files"][author]
+
+
+def load_synthetic_ko_data(path, cache=None, workers=None):
+    """
+    Loads dataset written by write_synthetic_dataset in the same way as load_ko_data,
+    experimental data is labelled with author Synthetic
+    """
+    path = Path(path)
+    dataset = json.loads((path / _manifest_name).read_text())
+    loaders = {
+        "Khodayari": load_khodayari,
+        "Kurata": load_kurata,
+        "Millard": load_millard,
+        "Chassagnole": load_chassagnole,
+    }
+    with instrument.record() as report:
+        frames = [
+            loader(
+                sample_names="all",
+                load_path=path / author,
+                id_df=pd.read_csv(path / dataset["id_files"][author]),
+                files=dataset["files"][author],
+                cache=cache,
+                workers=workers,
+            )
+            for author, loader in loaders.items()
+        ]
+        frames.append(
+            _load_experimental_ko_data(
+                cache, path / dataset["experimental"], author="Synthetic"
+            )
+        )
+        file_info = report.text()
+    return pd.concat(frames, sort=False), file_info
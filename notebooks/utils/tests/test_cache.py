@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import importlib
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from utils import cache
+from utils.cache import ResultCache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "result.csv"
+    path.write_text("ID,Value\nPGI,1.0\n")
+    return path
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    """
+    Parser defined in its own module, so its source can be changed
+    """
+    module_path = tmp_path / "toy_parser.py"
+    module_path.write_text("def parse(path):\n    return 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("toy_parser")
+    yield module
+    sys.modules.pop("toy_parser", None)
+    cache._module_sha1.cache_clear()
+
+
+def test_result_cache_roundtrip(tmp_path, source):
+    result_cache = ResultCache(tmp_path / "cache")
+    df = pd.DataFrame({"ID": ["PGI"], "Value": [1.0]})
+    assert result_cache.get(source, ("WT",)) is None
+    result_cache.put(source, ("WT",), df)
+    pd.testing.assert_frame_equal(result_cache.get(source, ("WT",)), df)
+    # manifest is shared by new instances
+    pd.testing.assert_frame_equal(
+        ResultCache(tmp_path / "cache").get(source, ("WT",)), df
+    )
+    assert result_cache.get(source, ("dpgi",)) is None
+
+
+def test_result_cache_source_change(tmp_path, source):
+    result_cache = ResultCache(tmp_path / "cache")
+    result_cache.put(source, ("WT",), 1)
+
+    # only modification time changed, content hash is the same
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert result_cache.get(source, ("WT",)) == 1
+
+    # same size, different content
+    source.write_text("ID,Value\nPGI,2.0\n")
+    assert result_cache.get(source, ("WT",)) is None
+
+
+def test_result_cache_version_change(tmp_path, source, monkeypatch):
+    result_cache = ResultCache(tmp_path / "cache")
+    result_cache.put(source, ("WT",), 1)
+    monkeypatch.setattr(cache, "cache_version", cache.cache_version + 1)
+    assert result_cache.get(source, ("WT",)) is None
+
+
+def test_result_cache_parser_change(tmp_path, source, parser):
+    result_cache = ResultCache(tmp_path / "cache")
+    result_cache.put(source, (parser.parse,), 1)
+    assert result_cache.get(source, (parser.parse,)) == 1
+
+    (tmp_path / "toy_parser.py").write_text("def parse(path):\n    return 2\n")
+    cache._module_sha1.cache_clear()
+    assert result_cache.get(source, (importlib.reload(parser).parse,)) is None
+
+
+def test_result_cache_load_and_clear(tmp_path, source):
+    result_cache = ResultCache(tmp_path / "cache")
+    calls = []
+    for _ in range(2):
+        assert result_cache.load(source, ("WT",), lambda: calls.append(1) or 1) == 1
+    assert len(calls) == 1
+    result_cache.clear()
+    assert result_cache.get(source, ("WT",)) is None
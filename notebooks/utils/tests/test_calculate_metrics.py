@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import xarray as xr
+
+from utils.calculate_metrics import (
+    MetricsStore,
+    _get_common_fluxes,
+    bootstrap_summary_errors,
+    branch_stat,
+    error_metrics,
+    process_data,
+    relative_errors,
+    summary_errors,
+)
+from utils.load import load_ko_data
+
+
+@pytest.fixture(scope="module")
+def ko_data():
+    return load_ko_data(cache=False)[0]
+
+
+# xarray implementation of the metrics before they were computed
+# on dense numpy arrays, the results have to stay the same
+
+
+def _process_data_xarray(data, author, trim_tca=True):
+    selected_fluxes = _get_common_fluxes(data, author, include_chassagnole=not trim_tca)
+    selected_data = (
+        data.query("BiGG_ID in @selected_fluxes")
+        .groupby(["BiGG_ID", "sample_id", "author"])[["flux", "normalized_flux"]]
+        .median()
+        .reset_index()
+    )
+    xdf = selected_data.set_index(["sample_id", "author", "BiGG_ID"]).to_xarray()
+
+    abs_flux = xdf.flux
+    xdf["normalized_flux"] = xdf.normalized_flux.where(
+        abs(xdf.normalized_flux) > 1e-1, 0.0
+    )
+    xdf["normalized_flux"] = xdf.normalized_flux.where(~abs_flux.isnull(), np.NaN)
+
+    if "Chassagnole" in xdf.author:
+        chassagnole = xdf.sel(dict(author="Chassagnole"))
+        ch = chassagnole.groupby("sample_id").apply(lambda x: x.flux.isnull().all())
+        selection = dict(
+            author="Chassagnole", sample_id=ch.where(~ch, drop=True).sample_id
+        )
+        for column in ["flux", "normalized_flux"]:
+            xdf[column].loc[selection] = xdf[column].loc[selection].fillna(0.0)
+    return xdf
+
+
+def _relative_errors_xarray(xdf, author):
+    abs_flux = xdf.flux
+    nm_flux = xdf.normalized_flux
+    exp_flux = xdf.sel(author=author).normalized_flux
+
+    xdf["relative_error"] = abs(nm_flux - exp_flux) / abs(exp_flux) * 100
+    xdf["relative_error"] = xdf["relative_error"].where(
+        ((nm_flux != 0) & (exp_flux != 0)), 100
+    )
+    xdf["relative_error"] = xdf["relative_error"].where(
+        ~((nm_flux == 0) & (exp_flux == 0)), 0
+    )
+    xdf["relative_error"] = xdf["relative_error"].where(~abs_flux.isnull(), np.NaN)
+    xdf["symm_relative_error"] = (
+        100 * abs(nm_flux - exp_flux) / ((abs(nm_flux) + abs(exp_flux)) / 2)
+    )
+    return xdf
+
+
+def _summary_errors_xarray(xdf, author):
+    def vector_norm(x, dim, ord=None):
+        return xr.apply_ufunc(
+            np.linalg.norm, x, input_core_dims=[[dim]], kwargs={"ord": ord, "axis": -1}
+        )
+
+    nm_flux = xdf.normalized_flux
+    exp_flux = xdf.sel(author=author).normalized_flux
+    diff_norm = vector_norm(nm_flux - exp_flux, dim="BiGG_ID", ord=2)
+    ishii_norm = vector_norm(exp_flux, dim="BiGG_ID", ord=2)
+    x_norm_error = (diff_norm / ishii_norm).where(~diff_norm.isnull(), np.NaN)
+    return xr.Dataset(
+        data_vars={"normalized_error": x_norm_error, "unnormalized_error": diff_norm}
+    )
+
+
+def _assert_same(actual, expected):
+    xr.testing.assert_allclose(
+        actual.transpose(*expected.dims), expected, rtol=1e-12, atol=0
+    )
+
+
+@pytest.mark.parametrize("trim_tca", [True, False])
+def test_process_data_matches_xarray(ko_data, trim_tca):
+    expected = _process_data_xarray(ko_data, "Ishii", trim_tca)
+    _assert_same(process_data(ko_data, "Ishii", trim_tca), expected)
+
+
+@pytest.mark.parametrize("trim_tca", [True, False])
+def test_error_metrics_match_xarray(ko_data, trim_tca):
+    xdf = process_data(ko_data, "Ishii", trim_tca)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = _relative_errors_xarray(xdf.copy(), "Ishii")
+        expected_summary = _summary_errors_xarray(xdf.copy(), "Ishii")
+        actual, actual_summary = error_metrics(xdf.copy(), "Ishii")
+
+        _assert_same(actual, expected)
+        _assert_same(actual_summary, expected_summary)
+        _assert_same(relative_errors(xdf.copy(), "Ishii"), expected)
+        _assert_same(summary_errors(xdf.copy(), "Ishii"), expected_summary)
+
+
+def _assert_store(store, data):
+    xdf = process_data(data, "Ishii")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = relative_errors(xdf.copy(), "Ishii")
+        expected_summary = summary_errors(xdf, "Ishii")
+        expected_branches = branch_stat(xdf)
+    _assert_same(store.processed(), xdf)
+    _assert_same(store.relative_errors(), expected)
+    _assert_same(store.summary_errors(), expected_summary)
+    _assert_same(store.branch_stat(), expected_branches)
+
+
+def test_metrics_store_matches_full_recompute(ko_data):
+    store = MetricsStore("Ishii")
+    authors = ["Ishii", "Khodayari", "Kurata", "Millard", "Chassagnole"]
+    data = ko_data[ko_data["author"].isin(authors)]
+    first = data[data["author"] != "Kurata"]
+    store.update(first)
+    _assert_store(store, first)
+
+    # adding a model recomputes only its samples
+    kurata = data[data["author"] == "Kurata"]
+    changed = store.update(kurata)
+    assert {author for author, _ in changed} == {"Kurata"}
+    _assert_store(store, data)
+
+    # unchanged data is not recomputed
+    assert not store.update(data)
+
+    # re-simulated model sample
+    data = data.copy()
+    resimulated = (data["author"] == "Millard") & (data["sample_id"] == "pgi")
+    data.loc[resimulated, ["flux", "normalized_flux"]] *= 1.5
+    assert store.update(data[resimulated]) == {("Millard", "pgi")}
+    _assert_store(store, data)
+
+    # new reference fluxes recompute metrics of every author for the sample
+    reference = (data["author"] == "Ishii") & (data["sample_id"] == "zwf")
+    data.loc[reference, ["flux", "normalized_flux"]] *= 0.5
+    changed = store.update(data[reference])
+    assert changed == {(author, "zwf") for author in authors}
+    _assert_store(store, data)
+
+
+def test_bootstrap_interval_contains_estimate():
+    xdf = process_data(load_ko_data(cache=False, errors=True)[0], "Ishii")
+    bootstrap = bootstrap_summary_errors(xdf, "Ishii", n_replicates=2000, seed=1)
+    estimate = summary_errors(xdf, "Ishii")
+
+    for name in ["normalized_error", "unnormalized_error"]:
+        np.testing.assert_array_equal(
+            bootstrap[f"{name}_estimate"].values, estimate[name].values
+        )
+        lower = bootstrap[name].sel(quantile=0.025).values
+        upper = bootstrap[name].sel(quantile=0.975).values
+        valid = ~np.isnan(estimate[name].values)
+        assert valid.any()
+        assert (lower[valid] <= estimate[name].values[valid]).all()
+        assert (estimate[name].values[valid] <= upper[valid]).all()
+        # the reference is resampled, so the WT interval has a width
+        assert (upper > lower)[list(xdf.sample_id.values).index("WT")].any()
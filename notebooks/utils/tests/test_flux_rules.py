@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.ids import get_id_table
+from utils.utils import (
+    FluxRules,
+    _kurata_rules,
+    _reaction_rules,
+    _tidy_fluxes,
+    get_chassagnole_rules,
+    get_khodayari_rules,
+    get_millard_rules,
+)
+
+
+columns = ["flux", "ID", "BiGG_ID", "author", "sample_id", "normalized_flux"]
+sample_ids = ["WT", "pgi", "zwf"]
+
+
+# Corrections of a single sample as the loaders applied them
+# before the rules were compiled into FluxRules
+
+
+def _khodayari_sample(flux, sample_id, id_df):
+    df = pd.DataFrame({"flux": flux, "ID": id_df["ID"], "BiGG_ID": id_df["BiGG ID"]})
+    df = df.assign(author="Khodayari", sample_id=sample_id)
+    for model_id in ["PGM", "PGK", "RPI"]:
+        df.loc[df["ID"] == model_id, "flux"] = (
+            -1 * df.loc[df["ID"] == model_id, "flux"].values[0]
+        )
+    glucose_uptake = df[df["ID"] == "EX_glc(e)"]["flux"].values[0]
+    return df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
+
+
+def _kurata_sample(flux, sample_id, kurata_ids):
+    df = pd.DataFrame(
+        {
+            "flux": flux,
+            "ID": kurata_ids["ID"].values,
+            "BiGG_ID": kurata_ids["BiGG ID"].values,
+        }
+    )
+    df = df.assign(author="Kurata", sample_id=sample_id)
+    add_fluxes_df = pd.DataFrame(
+        {
+            "flux": df[df["BiGG_ID"] == "GAPD"]["flux"].values[0],
+            "ID": "Gapdh",
+            "BiGG_ID": ["TPI", "PGM", "ENO", "PGK"],
+            "author": "Kurata",
+            "sample_id": sample_id,
+        }
+    )
+    df = pd.concat([df, add_fluxes_df], sort=False)
+    glucose_uptake = (
+        df[df["ID"] == "vPts4"]["flux"].values[0]
+        + df[df["ID"] == "vNonpts"]["flux"].values[0]
+    )
+    return df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
+
+
+def _reaction_rates_sample(flux, sample_id, id_df, author):
+    data = pd.DataFrame({"ID": id_df["ID"].values, "Value": flux})
+    df = pd.merge(left=data, right=id_df[["ID", "BiGG ID"]], how="left", on="ID")
+    df = df.assign(author=author, sample_id=sample_id)
+    df = df.rename({"BiGG ID": "BiGG_ID", "Value": "flux"}, axis=1)
+    if author == "Millard":
+        mdh_flux = (
+            df.loc[df.ID == "MQO", "flux"].values[0]
+            - df.loc[df.ID == "MDH", "flux"].values[0]
+        )
+        df.loc[df.BiGG_ID == "MDH", "flux"] = mdh_flux
+        glucose_uptake = df[df["ID"] == "XCH_GLC"]["flux"].values[0]
+    else:
+        glucose_uptake = df[df["ID"] == "vPTS"]["flux"].values[0]
+    return df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
+
+
+def _fluxes(n_reactions):
+    rng = np.random.default_rng(0)
+    return rng.normal(loc=1, size=(len(sample_ids), n_reactions))
+
+
+def _assert_same(actual, expected):
+    pdt.assert_frame_equal(
+        actual[columns].reset_index(drop=True),
+        expected[columns].reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_khodayari_rules():
+    id_df = get_id_table("Khodayari")
+    fluxes = _fluxes(len(id_df))
+    rules = FluxRules(get_khodayari_rules(), id_df["ID"], id_df["BiGG ID"])
+    expected = pd.concat(
+        [
+            _khodayari_sample(flux, sample_id, id_df)
+            for flux, sample_id in zip(fluxes, sample_ids)
+        ]
+    )
+    _assert_same(_tidy_fluxes(rules, fluxes, "Khodayari", sample_ids), expected)
+
+
+def test_kurata_rules():
+    id_df = get_id_table("Kurata")
+    kurata_ids = id_df[["ID", "BiGG ID"]].drop_duplicates(subset="ID")
+    fluxes = _fluxes(len(kurata_ids))
+    expected = pd.concat(
+        [
+            _kurata_sample(flux, sample_id, kurata_ids)
+            for flux, sample_id in zip(fluxes, sample_ids)
+        ]
+    )
+    _assert_same(
+        _tidy_fluxes(_kurata_rules(id_df), fluxes, "Kurata", sample_ids), expected
+    )
+
+
+@pytest.mark.parametrize(
+    "author, get_rules",
+    [("Millard", get_millard_rules), ("Chassagnole", get_chassagnole_rules)],
+)
+def test_reaction_rates_rules(author, get_rules):
+    id_df = get_id_table(author)
+    fluxes = _fluxes(len(id_df))
+    rates = pd.Series(fluxes[0], index=id_df["ID"].values)
+    rules, _ = _reaction_rules(get_rules(), rates, id_df)
+    expected = pd.concat(
+        [
+            _reaction_rates_sample(flux, sample_id, id_df, author)
+            for flux, sample_id in zip(fluxes, sample_ids)
+        ]
+    )
+    _assert_same(_tidy_fluxes(rules, fluxes, author, sample_ids), expected)
+
+
+def test_rules_do_not_modify_input():
+    id_df = get_id_table("Khodayari")
+    fluxes = _fluxes(len(id_df))
+    rules = FluxRules(get_khodayari_rules(), id_df["ID"], id_df["BiGG ID"])
+    flux, normalized_flux = rules.apply(fluxes[0])
+    assert flux.shape == normalized_flux.shape == (1, len(id_df))
+    np.testing.assert_array_equal(fluxes, _fluxes(len(id_df)))
+
+
+def test_unknown_rule():
+    with pytest.raises(ValueError):
+        FluxRules([{"rule": "swap", "ids": ["PGM"]}], ["PGM"], ["PGM"])
+    with pytest.raises(ValueError):
+        FluxRules(get_chassagnole_rules(), ["PGM"], ["PGM"])
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+cobra = pytest.importorskip("cobra")
+
+from utils.knockouts import screen_knockouts  # noqa: E402
+
+
+def _toy_model():
+    """
+    Glucose is taken up and converted to biomass by either PGI or G6PDH2r
+    """
+    model = cobra.Model("toy")
+    glc, g6p = cobra.Metabolite("glc"), cobra.Metabolite("g6p")
+    reactions = {
+        "EX_glc__D_e": ({glc: -1}, (-10, 0)),
+        "PGI": ({glc: -1, g6p: 1}, (0, 1000)),
+        "G6PDH2r": ({glc: -1, g6p: 1}, (0, 1000)),
+        "BIOMASS": ({g6p: -1}, (0, 1000)),
+    }
+    for reaction_id, (metabolites, bounds) in reactions.items():
+        reaction = cobra.Reaction(reaction_id)
+        reaction.add_metabolites(metabolites)
+        reaction.bounds = bounds
+        model.add_reactions([reaction])
+    model.objective = "BIOMASS"
+    return model
+
+
+def test_screen_knockouts_keeps_model():
+    model = _toy_model()
+    reference = {"EX_glc__D_e": -10, "PGI": 7, "G6PDH2r": 3, "BIOMASS": 10}
+    knockouts = [{"gene": "pgi", "id": "PGI"}, {"gene": "zwf", "id": "G6PDH2r"}]
+    n_variables = len(model.variables)
+    objective = str(model.objective.expression)
+
+    for _ in range(2):
+        df = screen_knockouts(model, reference, knockouts)
+        fluxes = df.set_index(["sample_id", "ID"])["flux"]
+        # the other branch takes over the whole glucose uptake
+        assert fluxes["pgi", "G6PDH2r"] == pytest.approx(10)
+        assert fluxes["zwf", "PGI"] == pytest.approx(10)
+        assert fluxes["pgi", "PGI"] == pytest.approx(0)
+        assert len(model.variables) == n_variables
+        assert str(model.objective.expression) == objective
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from utils.load import iter_ko_data, load_ko_data
+
+
+def test_iter_ko_data_matches_load_ko_data():
+    records = list(iter_ko_data(cache=False))
+    for author, sample_id, sample_df in records:
+        assert (sample_df["author"] == author).all()
+        assert (sample_df["sample_id"] == sample_id).all()
+        assert np.issubdtype(sample_df["flux"].dtype, np.floating)
+
+    keys = ["author", "sample_id", "ID", "BiGG_ID"]
+    columns = keys + ["flux", "normalized_flux"]
+    actual = pd.concat([sample_df for _, _, sample_df in records], sort=False)
+    expected = load_ko_data(cache=False)[0]
+    pdt.assert_frame_equal(
+        actual[columns].sort_values(keys).reset_index(drop=True),
+        expected[columns].sort_values(keys).reset_index(drop=True),
+    )
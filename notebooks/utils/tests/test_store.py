@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from utils import store
+from utils.load import load_ko_data
+
+
+def _frame(author, sample_ids, **columns):
+    n_rows = len(sample_ids)
+    data = {
+        "flux": np.arange(n_rows, dtype=float),
+        "ID": [f"R{i}" for i in range(n_rows)],
+        "BiGG_ID": [f"B{i}" for i in range(n_rows)],
+        "author": author,
+        "sample_id": sample_ids,
+        "normalized_flux": np.arange(n_rows) * 10.0,
+    }
+    data.update(columns)
+    return pd.DataFrame(data)
+
+
+def test_export_store_keeps_ko_data(tmp_path):
+    flux_store = store.export_store(tmp_path / "store", cache=False, errors=True)
+    expected = load_ko_data(cache=False, errors=True)[0]
+    assert "normalized_flux_error" in flux_store.float_columns
+    pdt.assert_frame_equal(
+        flux_store.to_frame("ko")[expected.columns],
+        expected.reset_index(drop=True).astype({"normalized_flux_error": float}),
+        check_like=True,
+    )
+
+
+def test_export_store_optional_columns(tmp_path, monkeypatch):
+    experiments = {
+        "batch_ko": _frame("Kurata", ["WT", "WT"], sampling_time=[1, 5]),
+        "dilution": _frame("Yao", ["0.2", "0.5", "0.7"]),
+    }
+    monkeypatch.setattr(store, "_load_experiments", lambda **kwargs: experiments)
+    flux_store = store.export_store(tmp_path / "store")
+    assert flux_store.float_columns == ["flux", "normalized_flux", "sampling_time"]
+
+    batch_ko = flux_store.to_frame("batch_ko")
+    assert batch_ko["sampling_time"].tolist() == [1.0, 5.0]
+    assert flux_store.to_frame("dilution")["sampling_time"].isna().all()
+    pdt.assert_frame_equal(
+        batch_ko.drop(columns="sampling_time"),
+        experiments["batch_ko"].drop(columns="sampling_time"),
+    )
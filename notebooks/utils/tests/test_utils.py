@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+import scipy.io as sio
+
+from utils.utils import _read_kurata_fluxes, get_kurata_flux_index, loadmat_slice
+
+
+selections = [
+    (None, None),
+    (-1, None),
+    (None, -1),
+    (5, 2),
+    (slice(2, 9), [3, 0, 3]),
+    ([6, 1, 6], slice(None, None, 2)),
+    ([], None),
+    (None, []),
+    ([], []),
+]
+
+
+def _matrix():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(11, 7))
+
+
+def _expected(matrix, rows, columns):
+    """
+    matrix[rows, columns] as loadmat_slice selects it, None selects everything
+    """
+    n_rows, n_columns = matrix.shape
+    rows = np.arange(n_rows)[slice(None) if rows is None else rows]
+    columns = np.arange(n_columns)[slice(None) if columns is None else columns]
+    return matrix[rows][..., columns]
+
+
+@pytest.fixture(params=[False, True], ids=["uncompressed", "compressed"])
+def v5_file(request, tmp_path):
+    path = tmp_path / "result.mat"
+    # Vnet is not the first variable, the others have to be skipped
+    sio.savemat(
+        path,
+        {"a": np.arange(3.0), "Vnet": _matrix(), "n": np.array([[2]], dtype="i4")},
+        do_compression=request.param,
+    )
+    return path
+
+
+@pytest.mark.parametrize("rows, columns", selections)
+def test_loadmat_slice_v5(v5_file, rows, columns):
+    expected = _expected(sio.loadmat(v5_file)["Vnet"], rows, columns)
+    np.testing.assert_array_equal(
+        loadmat_slice(v5_file, "Vnet", rows, columns), expected
+    )
+
+
+def test_loadmat_slice_small_element(v5_file):
+    # 1x1 int32 matrix is stored in the small data element format
+    assert loadmat_slice(v5_file, "n").tolist() == sio.loadmat(v5_file)["n"].tolist()
+
+
+def test_loadmat_slice_missing_variable(v5_file):
+    with pytest.raises(ValueError):
+        loadmat_slice(v5_file, "FLUX")
+
+
+@pytest.mark.parametrize("rows, columns", selections)
+def test_loadmat_slice_v73(tmp_path, rows, columns):
+    h5py = pytest.importorskip("h5py")
+    path = tmp_path / "result.mat"
+    with h5py.File(path, "w", userblock_size=512) as f:
+        # HDF5 keeps the matlab matrix transposed
+        f["Vnet"] = _matrix().T
+    with open(path, "r+b") as fh:
+        header = b"MATLAB 7.3 MAT-file".ljust(116) + b"\0" * 8
+        fh.write(header + b"\x00\x02IM")
+
+    np.testing.assert_array_equal(
+        loadmat_slice(path, "Vnet", rows, columns), _expected(_matrix(), rows, columns)
+    )
+
+
+def test_kurata_flux_index(tmp_path):
+    path = tmp_path / "result_cont_WT.mat"
+    flux = _matrix()
+    sio.savemat(path, {"FLUX": flux})
+
+    # continuous cultures are sampled at the end of integration
+    fluxes, _ = _read_kurata_fluxes(path, get_kurata_flux_index())
+    np.testing.assert_array_equal(fluxes, flux[[-1]])
+
+    # batch sampling times past the end of integration are NaNs
+    assert get_kurata_flux_index("batch") == 151
+    fluxes, _ = _read_kurata_fluxes(path, get_kurata_flux_index("batch", [-9.5, 5]))
+    np.testing.assert_array_equal(fluxes[0], flux[6])
+    assert np.isnan(fluxes[1]).all()
@@ -1,16 +1,34 @@
 # -*- coding: utf-8 -*-
+import io
+import struct
+import zlib
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+
 import scipy
 import scipy.io as sio
 import numpy as np
 import pandas as pd
 
+from . import instrument
+
+
+# scipy >= 1.8 exposes mat_struct directly, older versions only in mio5_params
+_mat_struct = getattr(sio.matlab, "mat_struct", None)
+if _mat_struct is None:
+    _mat_struct = sio.matlab.mio5_params.mat_struct
 
-def loadmat(filename):
+
+def loadmat(filename, variables=None):
     """
     this function should be called instead of direct spio.loadmat
     as it cures the problem of not properly recovering python dictionaries
     from mat files. It calls the function check keys to cure all entries
     which are still mat-objects
+    params:
+    :filename - path to the mat file
+    :variables - list of top-level variable names to read, None to read all of them
     """
 
     def _check_keys(d):
@@ -19,14 +37,17 @@ def loadmat(filename):
         todict is called to change them to nested dictionaries
         """
         for key in d:
-            if isinstance(d[key], sio.matlab.mio5_params.mat_struct):
+            if isinstance(d[key], _mat_struct):
                 d[key] = _todict(d[key])
         return d
 
     def _has_struct(elem):
         """Determine if elem is an array and if any array item is a struct"""
-        return isinstance(elem, np.ndarray) and any(
-            isinstance(e, scipy.io.matlab.mio5_params.mat_struct) for e in elem
+        # only object arrays (cell arrays) can hold structs, numeric ones are skipped
+        return (
+            isinstance(elem, np.ndarray)
+            and elem.dtype == object
+            and any(isinstance(e, _mat_struct) for e in elem)
         )
 
     def _todict(matobj):
@@ -36,7 +57,7 @@ def loadmat(filename):
         d = {}
         for strg in matobj._fieldnames:
             elem = matobj.__dict__[strg]
-            if isinstance(elem, sio.matlab.mio5_params.mat_struct):
+            if isinstance(elem, _mat_struct):
                 d[strg] = _todict(elem)
             elif _has_struct(elem):
                 d[strg] = _tolist(elem)
@@ -52,7 +73,7 @@ def loadmat(filename):
         """
         elem_list = []
         for sub_elem in ndarray:
-            if isinstance(sub_elem, sio.matlab.mio5_params.mat_struct):
+            if isinstance(sub_elem, _mat_struct):
                 elem_list.append(_todict(sub_elem))
             elif _has_struct(sub_elem):
                 elem_list.append(_tolist(sub_elem))
@@ -60,10 +81,296 @@ def loadmat(filename):
                 elem_list.append(sub_elem)
         return elem_list
 
-    data = scipy.io.loadmat(filename, struct_as_record=False, squeeze_me=True)
+    data = scipy.io.loadmat(
+        filename, struct_as_record=False, squeeze_me=True, variable_names=variables
+    )
     return _check_keys(data)
 
 
+# MAT-file v5 data types and array classes used by the slice reader,
+# see "MAT-File Format" documentation from MathWorks
+_MI_MATRIX = 14
+_MI_COMPRESSED = 15
+_MI_DTYPES = {
+    1: "i1",
+    2: "u1",
+    3: "i2",
+    4: "u2",
+    5: "i4",
+    6: "u4",
+    7: "f4",
+    9: "f8",
+    12: "i8",
+    13: "u8",
+}
+_MX_DTYPES = {
+    6: "f8",
+    7: "f4",
+    8: "i1",
+    9: "u1",
+    10: "i2",
+    11: "u2",
+    12: "i4",
+    13: "u4",
+    14: "i8",
+    15: "u8",
+}
+
+
+class _RawStream:
+    """
+    Uncompressed part of a mat file, skipping is a plain seek
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+
+    def read(self, n):
+        data = self._fh.read(n)
+        if len(data) < n:
+            raise ValueError("Unexpected end of mat file")
+        return data
+
+    def skip(self, n):
+        self._fh.seek(n, io.SEEK_CUR)
+
+
+class _CountingFile:
+    """
+    File wrapper counting bytes actually read from disk
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.bytes_read = 0
+
+    def read(self, n=-1):
+        data = self._fh.read(n)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._fh.seek(offset, whence)
+
+    def tell(self):
+        return self._fh.tell()
+
+
+class _InflateStream:
+    """
+    miCOMPRESSED data element which is inflated chunk by chunk,
+    skipped bytes are decompressed and thrown away without being stored
+    """
+
+    chunk_size = 1 << 16
+
+    def __init__(self, fh, nbytes):
+        self._fh = fh
+        self._remaining = nbytes
+        self._inflater = zlib.decompressobj()
+        self._buffer = b""
+        self._pos = 0
+
+    def _fill(self):
+        data = self._inflater.unconsumed_tail
+        if not data and self._remaining:
+            data = self._fh.read(min(self.chunk_size, self._remaining))
+            self._remaining -= len(data)
+        if data:
+            out = self._inflater.decompress(data, self.chunk_size)
+        else:
+            out = self._inflater.flush()
+            if not out:
+                raise ValueError("Unexpected end of compressed data in mat file")
+        self._buffer = self._buffer[self._pos :] + out
+        self._pos = 0
+
+    def read(self, n):
+        while len(self._buffer) - self._pos < n:
+            self._fill()
+        data = self._buffer[self._pos : self._pos + n]
+        self._pos += n
+        return data
+
+    def skip(self, n):
+        while len(self._buffer) - self._pos < n:
+            n -= len(self._buffer) - self._pos
+            self._buffer = b""
+            self._pos = 0
+            self._fill()
+        self._pos += n
+
+
+def _read_tag(stream, byte_order):
+    """
+    Returns data type, number of bytes and data if the element is in
+    the small data element format (otherwise None)
+    """
+    raw = stream.read(8)
+    mdtype, nbytes = struct.unpack(byte_order + "II", raw)
+    if mdtype >> 16:
+        nbytes = mdtype >> 16
+        return mdtype & 0xFFFF, nbytes, raw[4 : 4 + nbytes]
+    return mdtype, nbytes, None
+
+
+def _read_subelement(stream, byte_order):
+    mdtype, nbytes, small = _read_tag(stream, byte_order)
+    if small is not None:
+        return small
+    data = stream.read(nbytes)
+    stream.skip(-nbytes % 8)
+    return data
+
+
+def _select(index, size):
+    """
+    Converts index (int, slice, list or None for everything) into sorted unique
+    positions and the positions needed to restore the requested order
+    """
+    if index is None:
+        index = slice(None)
+    selected = np.arange(size)[index]
+    unique, inverse = np.unique(selected, return_inverse=True)
+    return unique, inverse.reshape(np.shape(selected))
+
+
+def _read_v5_block(fh, byte_order, variable, rows, columns, clip_rows=False):
+    while True:
+        raw = fh.read(8)
+        if len(raw) < 8:
+            raise ValueError(f"Unable to find variable {variable}")
+        mdtype, nbytes = struct.unpack(byte_order + "II", raw)
+        next_position = fh.tell() + nbytes
+        if mdtype == _MI_COMPRESSED:
+            stream = _InflateStream(fh, nbytes)
+            mdtype, _, _ = _read_tag(stream, byte_order)
+        else:
+            stream = _RawStream(fh)
+            next_position += -nbytes % 8
+
+        if mdtype == _MI_MATRIX:
+            flags = struct.unpack(byte_order + "II", _read_subelement(stream, byte_order))[0]
+            dims = np.frombuffer(_read_subelement(stream, byte_order), byte_order + "i4")
+            name = _read_subelement(stream, byte_order).decode("ascii")
+            if name == variable:
+                break
+        fh.seek(next_position)
+
+    mx_class = flags & 0xFF
+    if mx_class not in _MX_DTYPES or flags & 0x0800:
+        raise ValueError(f"Variable {variable} is not a real numeric matrix")
+    if len(dims) != 2:
+        raise ValueError(f"Variable {variable} has {len(dims)} dimensions, expected 2")
+    n_rows, n_columns = (int(x) for x in dims)
+    if clip_rows:
+        rows = _clip_rows(rows, n_rows)
+
+    mdtype, nbytes, small = _read_tag(stream, byte_order)
+    if small is not None:
+        stream = _RawStream(io.BytesIO(small))
+    dtype = np.dtype(byte_order + _MI_DTYPES[mdtype])
+
+    row_ids, row_order = _select(rows, n_rows)
+    column_ids, column_order = _select(columns, n_columns)
+
+    # mat files are column-major, pick requested elements in the order they are stored
+    positions = (column_ids[:, None] * n_rows + row_ids[None, :]).ravel()
+    values = np.empty(len(positions), dtype=dtype)
+    run_starts = np.flatnonzero(np.diff(positions) != 1) + 1
+    offset = 0
+    for start, end in zip(
+        np.concatenate([[0], run_starts]), np.concatenate([run_starts, [len(positions)]])
+    ):
+        if start == end:
+            continue
+        stream.skip(int(positions[start] - offset) * dtype.itemsize)
+        values[start:end] = np.frombuffer(
+            stream.read((end - start) * dtype.itemsize), dtype=dtype
+        )
+        offset = positions[end - 1] + 1
+
+    block = values.reshape(len(column_ids), len(row_ids)).T.astype(_MX_DTYPES[mx_class])
+    return block[row_order][..., column_order], (n_rows, n_columns)
+
+
+def _read_hdf5_block(filename, variable, rows, columns, clip_rows=False):
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("h5py is required to read MATLAB v7.3 mat files")
+
+    with h5py.File(filename, "r") as f:
+        if variable not in f:
+            raise ValueError(f"Unable to find variable {variable}")
+        dataset = f[variable]
+        if dataset.ndim != 2:
+            raise ValueError(
+                f"Variable {variable} has {dataset.ndim} dimensions, expected 2"
+            )
+        # HDF5 keeps the matlab matrix transposed
+        n_columns, n_rows = dataset.shape
+        if clip_rows:
+            rows = _clip_rows(rows, n_rows)
+        row_ids, row_order = _select(rows, n_rows)
+        column_ids, column_order = _select(columns, n_columns)
+        if not len(row_ids) or not len(column_ids):
+            block = np.empty((len(column_ids), len(row_ids)), dtype=dataset.dtype)
+        elif len(column_ids) <= len(row_ids):
+            block = dataset[list(column_ids), row_ids[0] : row_ids[-1] + 1]
+            block = block[:, row_ids - row_ids[0]]
+        else:
+            block = dataset[column_ids[0] : column_ids[-1] + 1, list(row_ids)]
+            block = block[column_ids - column_ids[0], :]
+    return block.T[row_order][..., column_order], (n_rows, n_columns)
+
+
+def _clip_rows(rows, n_rows):
+    """
+    Drops rows past the end of the matrix
+    """
+    rows = np.asarray(rows, dtype=int)
+    return rows[rows < n_rows]
+
+
+def _read_mat_block(filename, variable, rows=None, columns=None, clip_rows=False):
+    """
+    Returns selected block of the variable and shape of the whole variable,
+    with clip_rows the rows past the end of the matrix are left out of the block
+    """
+    with open(filename, "rb") as raw:
+        fh = _CountingFile(raw)
+        header = fh.read(128)
+        byte_order = "<" if header[126:128] == b"IM" else ">"
+        version = struct.unpack(byte_order + "H", header[124:126])[0]
+        if version != 0x0200:
+            try:
+                return _read_v5_block(fh, byte_order, variable, rows, columns, clip_rows)
+            finally:
+                instrument.count_bytes(fh.bytes_read)
+    # bytes read by HDF5 are not known
+    return _read_hdf5_block(filename, variable, rows, columns, clip_rows)
+
+
+def loadmat_slice(filename, variable, rows=None, columns=None):
+    """
+    Reads only the selected part of a 2D numeric variable from a mat file,
+    e.g. the last column of Vnet without building the whole matrix in memory.
+    Other variables in the file are skipped without decompressing them,
+    uncompressed data is reached by seeking and compressed data is inflated
+    in chunks which are discarded until requested elements are reached.
+    Both MAT v5 (compressed or not) and v7.3 (requires h5py) are supported.
+    params:
+    :filename - path to the mat file
+    :variable - name of the variable to read
+    :rows - int, slice or list of row indices, None for all rows
+    :columns - int, slice or list of column indices, None for all columns
+    Returns np.ndarray equivalent to loadmat(filename)[variable][rows, columns]
+    """
+    block, _ = _read_mat_block(filename, variable, rows, columns)
+    return block
+
+
 def get_khodayari_kos():
     return {
         "fbaA": "result_cont_Delta_fbaAB.mat",
@@ -366,24 +673,226 @@ def get_chassagnole_dilutions():
     samples = ["0.2", "0.4", "0.6", "0.7"]
     return {k: f"Chassagnole_result_{k.replace('.','')}.csv" for k in samples}
 
+
+# Model specific corrections of simulated fluxes, rules are applied in order
+# by FluxRules to all samples of a model at once:
+# - flip: change direction of reactions with given model ids
+# - sum / difference: set reactions selected by target_id or target_bigg_id
+#   to the sum / difference of the reactions with given model ids
+# - alias: copy the first reaction with given bigg_id into new rows
+# - normalize_by: normalize all fluxes to the sum of given reactions (times 100)
+
+
+def get_khodayari_rules():
+    return [
+        # fix PGM, PGK and RPI direction
+        {"rule": "flip", "ids": ["PGM", "PGK", "RPI"]},
+        # normalize to the glucose uptake
+        {"rule": "normalize_by", "ids": ["EX_glc(e)"]},
+    ]
+
+
+def get_kurata_rules():
+    return [
+        # Gapdh reaction in Kuratas model is a sum of gapA, tpiA, gpmA or gpmM, eno, pgk
+        {
+            "rule": "alias",
+            "bigg_id": "GAPD",
+            "new_id": "Gapdh",
+            "new_bigg_ids": ["TPI", "PGM", "ENO", "PGK"],
+        },
+        # calculate normalized fluxes with respect to Glucose consumption
+        {"rule": "normalize_by", "ids": ["vPts4", "vNonpts"]},
+    ]
+
+
+def get_millard_rules():
+    return [
+        # Set MDH reaction to be the difference between MQO and MDH flux
+        {"rule": "difference", "target_bigg_id": "MDH", "ids": ["MQO", "MDH"]},
+        {"rule": "normalize_by", "ids": ["XCH_GLC"]},
+    ]
+
+
+def get_chassagnole_rules():
+    return [{"rule": "normalize_by", "ids": ["vPTS"]}]
+
 # Set of routines to load data for various models
 # and present them as pandas dataframe
 
 
-def load_khodayari(sample_names, load_path, id_df, files=None):
-    """ Will return single dataframe with columns:
-    - author=Khodayari, 
-    - sample_id corresponding to relevant sample
-    - flux with correspoding value in original units
-    - ID showing original id
-    - BiGG ID with BiGG identifier
+class FluxRules:
+    """
+    Rules from get_*_rules compiled into index arrays for a given order of reactions.
+    apply() runs them on a matrix of fluxes (samples x reactions)
+    so every sample is corrected by the same few numpy operations.
     params:
-    :sample_names - list of sample names or "all"
-    :load_path - Path object where the samples are located
-    :id_df - pd.DataFrame with conversion Model ID -> BiGG ID
-    :files - dict where key is sample name and value is filename
+    :rules - list of rules, see get_khodayari_rules
+    :ids - model ids of reactions in the order of flux vectors
+    :bigg_ids - corresponding BiGG ids
+    """
+
+    def __init__(self, rules, ids, bigg_ids):
+        self.ids = np.asarray(ids, dtype=object)
+        self.bigg_ids = np.asarray(bigg_ids, dtype=object)
+        self._operations = []
+
+        for rule in rules:
+            kind = rule["rule"]
+            if kind == "flip":
+                targets = [self._rows(self.ids, model_id) for model_id in rule["ids"]]
+                self._operations.append(
+                    (
+                        "flip",
+                        np.concatenate(targets),
+                        np.concatenate([[rows[0]] * len(rows) for rows in targets]),
+                    )
+                )
+            elif kind in ("sum", "difference"):
+                if "target_bigg_id" in rule:
+                    targets = self._rows(self.bigg_ids, rule["target_bigg_id"])
+                else:
+                    targets = self._rows(self.ids, rule["target_id"])
+                sources = np.array([self._rows(self.ids, x)[0] for x in rule["ids"]])
+                signs = np.ones(len(sources))
+                if kind == "difference":
+                    signs[1:] = -1
+                self._operations.append(("combine", targets, sources, signs))
+            elif kind == "alias":
+                source = self._rows(self.bigg_ids, rule["bigg_id"])[0]
+                new_bigg_ids = rule["new_bigg_ids"]
+                self.ids = np.append(self.ids, [rule["new_id"]] * len(new_bigg_ids))
+                self.bigg_ids = np.append(self.bigg_ids, new_bigg_ids)
+                self._operations.append(("alias", np.full(len(new_bigg_ids), source)))
+            elif kind == "normalize_by":
+                sources = np.array([self._rows(self.ids, x)[0] for x in rule["ids"]])
+                self._operations.append(("normalize_by", sources))
+            else:
+                raise ValueError(f"Unknown rule {kind}")
+
+    @staticmethod
+    def _rows(ids, value):
+        rows = np.flatnonzero(ids == value)
+        if not len(rows):
+            raise ValueError(f"Unable to find reaction {value}")
+        return rows
+
+    def apply(self, fluxes):
+        """
+        Returns corrected fluxes and normalized fluxes (None without normalize_by rule),
+        both with a column for every reaction in self.ids
+        """
+        flux = np.array(fluxes, dtype=float, ndmin=2)
+        normalized_flux = None
+        for operation, *indices in self._operations:
+            if operation == "flip":
+                targets, sources = indices
+                flux[:, targets] = -flux[:, sources]
+            elif operation == "combine":
+                targets, sources, signs = indices
+                flux[:, targets] = (flux[:, sources] @ signs)[:, None]
+            elif operation == "alias":
+                flux = np.concatenate([flux, flux[:, indices[0]]], axis=1)
+            elif operation == "normalize_by":
+                glucose_uptake = flux[:, indices[0]].sum(axis=1, keepdims=True)
+                normalized_flux = flux * 100 / glucose_uptake
+        return flux, normalized_flux
+
+
+def _tidy_fluxes(rules, fluxes, author, sample_ids, **columns):
+    """
+    Applies rules to fluxes (samples x reactions) and builds
+    the dataframe with one row per sample and reaction.
+    Additional per-sample columns can be passed as keyword arguments.
+    """
+    flux, normalized_flux = rules.apply(fluxes)
+    n_samples, n_reactions = flux.shape
+    data = {
+        "flux": flux.ravel(),
+        "ID": np.tile(rules.ids, n_samples),
+        "BiGG_ID": np.tile(rules.bigg_ids, n_samples),
+        "author": author,
+        "sample_id": np.repeat(np.asarray(sample_ids, dtype=object), n_reactions),
+    }
+    for name, values in columns.items():
+        data[name] = np.repeat(np.asarray(values, dtype=object), n_reactions)
+    data["normalized_flux"] = normalized_flux.ravel()
+    return pd.DataFrame(data, index=np.tile(np.arange(n_reactions), n_samples))
+
+
+def _parse_file(parse, args):
+    """
+    Calls parse(*args) as a parse span with number of fluxes,
+    bytes_read is reported by the readers (see instrument.count_bytes)
     """
+    file_path = Path(args[0])
+    with instrument.span("parse", name=file_path.name, sample_id=args[1]) as event:
+        result = parse(*args)
+        event["rows"] = int(np.size(result))
+    return result
 
+
+def _parse_samples(parse, jobs, cache=None, workers=None):
+    """
+    Calls parse(file_path, *args) for each (file_path, *args) in jobs
+    and returns the results in the order of jobs.
+    params:
+    :parse - module level function parsing a single file
+    :jobs - list of argument tuples, first argument is the path to the file
+    :cache - cache.ResultCache to reuse already parsed files, None to always parse
+    :workers - number of worker processes or Executor to parse files in parallel,
+      None to parse them one by one
+    """
+    results = [None] * len(jobs)
+    if cache is not None:
+        for i, args in enumerate(jobs):
+            results[i] = cache.get(args[0], (parse,) + tuple(args[1:]))
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    if workers is None or len(pending) < 2:
+        for i in pending:
+            results[i] = _parse_file(parse, jobs[i])
+    else:
+        if isinstance(workers, Executor):
+            pool = workers
+        else:
+            pool = ProcessPoolExecutor(workers)
+        try:
+            # events recorded in workers are sent back with the results
+            memory = instrument._memory()
+            futures = [
+                pool.submit(
+                    instrument.run_recorded, _parse_file, (parse, jobs[i]), memory
+                )
+                for i in pending
+            ]
+            for i, future in zip(pending, futures):
+                results[i], events = future.result()
+                instrument.replay(events)
+        finally:
+            if pool is not workers:
+                pool.shutdown()
+
+    if cache is not None:
+        for i in pending:
+            cache.put(jobs[i][0], (parse,) + tuple(jobs[i][1:]), results[i])
+    return results
+
+
+def _concat(frames):
+    """
+    Concatenates per-sample dataframes at once instead of growing the result
+    sample by sample, which copies everything loaded so far on every step
+    """
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, sort=False)
+
+
+def _select_samples(sample_names, files):
+    """
+    Returns list of requested sample names, "all" selects every sample in files
+    """
     if files is None:
         raise ValueError("files dictionary is not specified")
 
@@ -398,135 +907,287 @@ def load_khodayari(sample_names, load_path, id_df, files=None):
     elif unknown_ids:
         error_msg = ", ".join(unknown_ids)
         raise ValueError(f"Unable to find relevant data for {error_msg}")
+    return list(sample_names)
+
 
-    res_df = pd.DataFrame()
+def _parse_khodayari(file_path, sample_id, time_index=-1, n_reactions=457):
+    """
+    Returns Khodayari flux vector from a single simulation file,
+    first n_reactions rows of Vnet are fluxes of reactions in the ID table
+    """
+    # Vnet[:, -1] is the last column of integration, ideally it should be closer to steady state
+    # khod_rxn_ids[455] is the index of 'Biomass' flux, the last flux id
+    flux, data_shape = _read_mat_block(
+        file_path, "Vnet", rows=slice(0, n_reactions), columns=time_index
+    )
+    instrument.log(
+        f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
+    )
+    return flux
+
+
+@instrument.timed("load_khodayari")
+def load_khodayari(
+    sample_names, load_path, id_df, files=None, time_index=-1, cache=None, workers=None
+):
+    """ Will return single dataframe with columns:
+    - author=Khodayari, 
+    - sample_id corresponding to relevant sample
+    - flux with correspoding value in original units
+    - ID showing original id
+    - BiGG ID with BiGG identifier
+    params:
+    :sample_names - list of sample names or "all"
+    :load_path - Path object where the samples are located
+    :id_df - pd.DataFrame with conversion Model ID -> BiGG ID
+    :files - dict where key is sample name and value is filename
+    :time_index - column of Vnet to use, by default the last integration point
+    :cache - cache.ResultCache to reuse already parsed files, None to always parse
+    :workers - number of processes (or Executor) to parse files in parallel
+    """
+    sample_names = _select_samples(sample_names, files)
+    jobs = [
+        (load_path / files[sample_id], sample_id, time_index, len(id_df))
+        for sample_id in sample_names
+    ]
+    fluxes = _parse_samples(_parse_khodayari, jobs, cache, workers)
+    if not fluxes:
+        return pd.DataFrame()
+
+    rules = FluxRules(get_khodayari_rules(), id_df["ID"], id_df["BiGG ID"])
+    return _tidy_fluxes(rules, np.vstack(fluxes), "Khodayari", sample_names)
+
+
+def iter_khodayari(
+    sample_names, load_path, id_df, files=None, time_index=-1, cache=None
+):
+    """
+    Same as load_khodayari, but parses one file at a time
+    and yields (author, sample_id, dataframe of the sample),
+    the flux vector is its flux column with reactions in the order of the ID column
+    """
+    sample_names = _select_samples(sample_names, files)
+    rules = FluxRules(get_khodayari_rules(), id_df["ID"], id_df["BiGG ID"])
     for sample_id in sample_names:
-        file_name = files[sample_id]
-        data = loadmat(load_path / file_name)
-        data_shape = data["Vnet"].shape
-        print(
-            f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
+        job = (load_path / files[sample_id], sample_id, time_index, len(id_df))
+        flux = _parse_samples(_parse_khodayari, [job], cache)[0]
+        yield "Khodayari", sample_id, _tidy_fluxes(
+            rules, flux, "Khodayari", [sample_id]
         )
 
-        # data['Vnet'][:,data_shape[1]-1] is the last column of integration, ideally it should be closer to steady state
-        # khod_rxn_ids[455] is the index of 'Biomass' flux, the last flux id
-        df = pd.DataFrame(
-            {
-                "flux": data["Vnet"][0:457, data_shape[1] - 1],
-                "ID": id_df["ID"],
-                "BiGG_ID": id_df["BiGG ID"],
-            }
-        )
-        df = df.assign(author="Khodayari", sample_id=sample_id)
 
-        # fix PGM direction
-        df.loc[df["ID"] == "PGM", "flux"] = (
-            -1 * df.loc[df["ID"] == "PGM", "flux"].values[0]
-        )
+def get_kurata_flux_index(mode="continuous", sampling_time=None):
+    """
+    Returns row(s) of Kurata FLUX matrix corresponding to the sampling time in hours.
+    Both batch and continuous simulations use span = -10:0.1:end, by default
+    continuous cultures are sampled at the end of integration (the last row,
+    row 2100 for the 200 hours long simulations) and batch cultures at 5 hours.
+    params:
+    :mode - "continuous" or "batch"
+    :sampling_time - number or list of numbers, None for the default sampling time
+    """
+    if mode not in ("continuous", "batch"):
+        raise ValueError(f"Unknown mode {mode}, use continuous or batch")
 
-        # fix PGK direction
-        df.loc[df["ID"] == "PGK", "flux"] = (
-            -1 * df.loc[df["ID"] == "PGK", "flux"].values[0]
-        )
+    if sampling_time is None:
+        if mode == "continuous":
+            # last row, so the index follows the length of the integration
+            return -1
+        # 5 hour sampling time for batch
+        sampling_time = 5
+
+    if isinstance(sampling_time, list):
+        return [101 + int(round(10 * t)) for t in sampling_time]
+    return 101 + int(round(10 * sampling_time))
 
-        # fix RPI direction
-        df.loc[df["ID"] == "RPI", "flux"] = (
-            -1 * df.loc[df["ID"] == "RPI", "flux"].values[0]
+
+def _read_kurata_fluxes(file_path, flux_index):
+    """
+    Reads only requested rows of FLUX, rows which were not reached by
+    the simulation (integration stopped early) are returned as NaNs
+    """
+    rows = np.atleast_1d(flux_index)
+    # rows past the end are left out, so the file is opened and read only once
+    block, data_shape = _read_mat_block(file_path, "FLUX", rows=rows, clip_rows=True)
+    available = rows < data_shape[0]
+    fluxes = np.full((len(rows), data_shape[1]), np.nan)
+    fluxes[available] = block
+    if not available.all():
+        instrument.log(
+            f"Flux matrix of {file_path.name} has no rows {rows[~available]}"
         )
+    return fluxes, data_shape
 
-        # normalize to the glucose uptake
-        glucose_uptake = df[df["ID"] == "EX_glc(e)"]["flux"].values[0]
-        df = df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
 
-        # update
-        res_df = pd.concat([res_df, df])
+def _parse_kurata(file_path, sample_id, flux_index):
+    """
+    Returns Kurata flux vectors (one per requested row) from a single simulation file
+    """
+    fluxes, data_shape = _read_kurata_fluxes(file_path, flux_index)
+    instrument.log(
+        f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
+    )
+    return fluxes
 
-    return res_df
 
+def _kurata_rules(id_df):
+    # this weird construction helps to deal with multiple IDs corresponding to Gapdh reaction
+    # which in Kuratas model is a sum of gapA, tpiA, gpmA or gpmM, eno, pgk
+    # resulting id would be GAPD.
+    kurata_ids = id_df[["ID", "BiGG ID"]].drop_duplicates(subset="ID")
+    return FluxRules(get_kurata_rules(), kurata_ids["ID"], kurata_ids["BiGG ID"])
 
-def load_kurata(sample_names, load_path, id_df, files=None, mode="continuous"):
+
+def _kurata_frame(rules, fluxes, sample_names, sampling_time):
+    """
+    Builds dataframe from parsed flux matrices of the samples,
+    each of them has a row per requested sampling time
+    """
+    if not isinstance(sampling_time, list):
+        return _tidy_fluxes(rules, np.vstack(fluxes), "Kurata", sample_names)
+
+    n_times = len(sampling_time)
+    return _tidy_fluxes(
+        rules,
+        np.vstack(fluxes),
+        "Kurata",
+        np.repeat(np.asarray(sample_names, dtype=object), n_times),
+        sampling_time=np.tile(np.asarray(sampling_time, dtype=object), len(fluxes)),
+    )
+
+
+@instrument.timed("load_kurata")
+def load_kurata(
+    sample_names,
+    load_path,
+    id_df,
+    files=None,
+    mode="continuous",
+    sampling_time=None,
+    cache=None,
+    workers=None,
+):
     """ Will return single dataframe with columns:
     - author=Kurata, 
     - sample_id corresponding to relevant sample
     - flux with correspoding value in original units
     - ID with BiGG identifier
+    - sampling_time only if list of sampling times was requested
     params:
     :sample_names - list of sample names or "all"
     :load_path - Path object where the samples are located
     :id_df - pd.DataFrame with conversion Model ID -> BiGG ID
     :files - dict where key is sample name and value is filename
+    :mode - "continuous" or "batch" culture
+    :sampling_time - time in hours (or list of them) to take fluxes from,
+      see get_kurata_flux_index for defaults
+    :cache - cache.ResultCache to reuse already parsed files, None to always parse
+    :workers - number of processes (or Executor) to parse files in parallel
       """
-    if files is None:
-        raise ValueError("files dictionary is not specified")
-
-    if type(sample_names) is not list:
-        sample_names = [sample_names]
-
-    # check mismatch with sample names in inputs
-    unknown_ids = [elem for elem in sample_names if elem not in files.keys()]
-
-    if sample_names == ["all"]:
-        sample_names = files.keys()
-    elif unknown_ids:
-        error_msg = ", ".join(unknown_ids)
-        raise ValueError(f"Unable to find relevant data for {error_msg}")
-
-    res_df = pd.DataFrame()
+    sample_names = _select_samples(sample_names, files)
+    flux_index = get_kurata_flux_index(mode, sampling_time)
+    jobs = [
+        (load_path / files[sample_id], sample_id, flux_index)
+        for sample_id in sample_names
+    ]
+    fluxes = _parse_samples(_parse_kurata, jobs, cache, workers)
+    if not fluxes:
+        return pd.DataFrame()
+
+    return _kurata_frame(_kurata_rules(id_df), fluxes, sample_names, sampling_time)
+
+
+def iter_kurata(
+    sample_names,
+    load_path,
+    id_df,
+    files=None,
+    mode="continuous",
+    sampling_time=None,
+    cache=None,
+):
+    """
+    Same as load_kurata, but parses one file at a time
+    and yields (author, sample_id, dataframe of the sample),
+    the flux vector is its flux column with reactions in the order of the ID column
+    """
+    sample_names = _select_samples(sample_names, files)
+    flux_index = get_kurata_flux_index(mode, sampling_time)
+    rules = _kurata_rules(id_df)
     for sample_id in sample_names:
-        file_name = files[sample_id]
-        data = loadmat(load_path / file_name)
-        data_shape = data["FLUX"].shape
-        print(
-            f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
+        job = (load_path / files[sample_id], sample_id, flux_index)
+        fluxes = _parse_samples(_parse_kurata, [job], cache)
+        yield "Kurata", sample_id, _kurata_frame(
+            rules, fluxes, [sample_id], sampling_time
         )
 
-        # this weird construction helps to deal with multiple IDs corresponding to Gapdh reaction
-        # which in Kuratas model is a sum of gapA, tpiA, gpmA or gpmM, eno, pgk
-        # resulting id would be GAPD.
-        kurata_ids = id_df[["ID", "BiGG ID"]].drop_duplicates(subset="ID")
 
-        if mode == "continuous":
-            flux_index = 2100
-        elif mode == "batch":
-            # 5 hour sampling time for batch
-            flux_index = 101 + 10 * 5
-
-        df = pd.DataFrame(
-            {
-                "flux": data["FLUX"][flux_index,],
-                "ID": kurata_ids["ID"].values,
-                "BiGG_ID": kurata_ids["BiGG ID"].values,
-            }
-        )
-        df = df.assign(author="Kurata", sample_id=sample_id)
-
-        # add results from Gapdh reaction
-        flux_val = df[df["BiGG_ID"] == "GAPD"]["flux"].values[0]
-        add_fluxes_df = pd.DataFrame(
-            {
-                "flux": flux_val,
-                "ID": "Gapdh",
-                "BiGG_ID": ["TPI", "PGM", "ENO", "PGK"],
-                "author": "Kurata",
-                "sample_id": sample_id,
-            }
-        )
-        df = df.append(add_fluxes_df, sort=False)
+def _parse_reaction_rates(file_path, sample_id):
+    """
+    Returns pd.Series of reaction rates indexed by model ID
+    from a single SBML model simulation file (Millard, Chassagnole)
+    """
+    data = pd.read_csv(file_path)
+    # the whole file is read
+    instrument.count_bytes(Path(file_path).stat().st_size)
+    data_shape = data["ID"].shape
+    instrument.log(
+        f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
+    )
+    return pd.Series(data["Value"].values, index=data["ID"].values)
 
-        # calculate normalized fluxes with respect to Glucose consumption
-        glucose_uptake = (
-            df[df["ID"] == "vPts4"]["flux"].values[0]
-            + df[df["ID"] == "vNonpts"]["flux"].values[0]
-        )
-        df = df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
 
-        # update
-        res_df = pd.concat([res_df, df])
+def _reaction_rules(rules, rates, id_df):
+    """
+    Compiles rules for the reactions of the first parsed file,
+    returns FluxRules and model IDs to align rates of other files to
+    """
+    reactions = pd.merge(
+        left=pd.DataFrame({"ID": rates.index}),
+        right=id_df[["ID", "BiGG ID"]],
+        how="left",
+        on="ID",
+    )
+    return FluxRules(rules, reactions["ID"], reactions["BiGG ID"]), reactions["ID"]
+
+
+def _load_reaction_rates(
+    author, rules, sample_names, load_path, id_df, files, cache, workers
+):
+    """
+    Loads files with reaction rates for all samples, IDs are taken from the first
+    file and rates from other files are aligned to them
+    """
+    sample_names = _select_samples(sample_names, files)
+    jobs = [(load_path / files[sample_id], sample_id) for sample_id in sample_names]
+    rates = _parse_samples(_parse_reaction_rates, jobs, cache, workers)
+    if not rates:
+        return pd.DataFrame()
 
-    return res_df
+    rules, reaction_ids = _reaction_rules(rules, rates[0], id_df)
+    fluxes = np.vstack([rate.reindex(reaction_ids).values for rate in rates])
+    return _tidy_fluxes(rules, fluxes, author, sample_names)
 
 
-def load_millard(sample_names, load_path, id_df, files=None):
+def _iter_reaction_rates(author, rules, sample_names, load_path, id_df, files, cache):
+    """
+    Generator version of _load_reaction_rates
+    """
+    sample_names = _select_samples(sample_names, files)
+    reaction_ids = None
+    for sample_id in sample_names:
+        job = (load_path / files[sample_id], sample_id)
+        rate = _parse_samples(_parse_reaction_rates, [job], cache)[0]
+        if reaction_ids is None:
+            rules, reaction_ids = _reaction_rules(rules, rate, id_df)
+        flux = rate.reindex(reaction_ids).values
+        yield author, sample_id, _tidy_fluxes(rules, flux, author, [sample_id])
+
+
+@instrument.timed("load_millard")
+def load_millard(
+    sample_names, load_path, id_df, files=None, cache=None, workers=None
+):
     """ Will return single dataframe with columns:
     - author=Millard, 
     - sample_id corresponding to relevant sample
@@ -537,57 +1198,30 @@ def load_millard(sample_names, load_path, id_df, files=None):
     :load_path - Path object where the samples are located
     :id_df - pd.DataFrame with conversion Model ID -> BiGG ID
     :files - dict where key is sample name and value is filename
+    :cache - cache.ResultCache to reuse already parsed files, None to always parse
+    :workers - number of processes (or Executor) to parse files in parallel
       """
-    if files is None:
-        raise ValueError("files dictionary is not specified")
-
-    if type(sample_names) is not list:
-        sample_names = [sample_names]
-
-    # check mismatch with sample names in inputs
-    unknown_ids = [elem for elem in sample_names if elem not in files.keys()]
-
-    if sample_names == ["all"]:
-        sample_names = files.keys()
-    elif unknown_ids:
-        error_msg = ", ".join(unknown_ids)
-        raise ValueError(f"Unable to find relevant data for {error_msg}")
-
-    res_df = pd.DataFrame()
-    for sample_id in sample_names:
-        file_name = files[sample_id]
-
-        data = pd.read_csv(load_path / file_name)
-        data_shape = data["ID"].shape
-        print(
-            f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
-        )
-
-        df = pd.merge(
-            left=data.drop("Unnamed: 0", axis=1),
-            right=id_df[["ID", "BiGG ID"]],
-            how="left",
-            on="ID",
-        )
-
-        df = df.assign(author="Millard", sample_id=sample_id)
-        df = df.rename({"BiGG ID": "BiGG_ID", "Value": "flux"}, axis=1)
-
-        # Set MDH reaction to be the difference between MQO and MDH flux
-        mdh_flux = (
-            df.loc[df.ID == "MQO", "flux"].values[0]
-            - df.loc[df.ID == "MDH", "flux"].values[0]
-        )
-        df.loc[df.BiGG_ID == "MDH", "flux"] = mdh_flux
-
-        # Calculate normalized fluxes
-        glucose_uptake = df[df["ID"] == "XCH_GLC"]["flux"].values[0]
-        df = df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
-
-        # update
-        res_df = pd.concat([res_df, df])
-
-    return res_df
+    return _load_reaction_rates(
+        "Millard",
+        get_millard_rules(),
+        sample_names,
+        load_path,
+        id_df,
+        files,
+        cache,
+        workers,
+    )
+
+
+def iter_millard(sample_names, load_path, id_df, files=None, cache=None):
+    """
+    Same as load_millard, but parses one file at a time
+    and yields (author, sample_id, dataframe of the sample),
+    the flux vector is its flux column with reactions in the order of the ID column
+    """
+    return _iter_reaction_rates(
+        "Millard", get_millard_rules(), sample_names, load_path, id_df, files, cache
+    )
 
 
 def load_kotte(sample_names, load_path, id_df, files=None):
@@ -618,13 +1252,13 @@ def load_kotte(sample_names, load_path, id_df, files=None):
         error_msg = ", ".join(unknown_ids)
         raise ValueError(f"Unable to find relevant data for {error_msg}")
 
-    res_df = pd.DataFrame()
+    frames = []
     for sample_id in sample_names:
         file_name = files[sample_id]
 
         data = pd.read_csv(load_path / file_name)
         data_shape = data["ID"].shape
-        print(
+        instrument.log(
             f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
         )
 
@@ -638,12 +1272,15 @@ def load_kotte(sample_names, load_path, id_df, files=None):
         df = df.assign(author="Kotte", sample_id=sample_id)
         df = df.rename({"BiGG ID": "BiGG_ID", "Value": "flux"}, axis=1)
         # update
-        res_df = pd.concat([res_df, df])
+        frames.append(df)
 
-    return res_df
+    return _concat(frames)
 
 
-def load_chassagnole(sample_names, load_path, id_df, files=None):
+@instrument.timed("load_chassagnole")
+def load_chassagnole(
+    sample_names, load_path, id_df, files=None, cache=None, workers=None
+):
     """ Will return single dataframe with columns:
     - author=Chassagnole, 
     - sample_id corresponding to relevant sample
@@ -654,47 +1291,33 @@ def load_chassagnole(sample_names, load_path, id_df, files=None):
     :load_path - Path object where the samples are located
     :id_df - pd.DataFrame with conversion Model ID -> BiGG ID
     :files - dict where key is sample name and value is filename
+    :cache - cache.ResultCache to reuse already parsed files, None to always parse
+    :workers - number of processes (or Executor) to parse files in parallel
       """
-    if files is None:
-        raise ValueError("files dictionary is not specified")
-
-    if type(sample_names) is not list:
-        sample_names = [sample_names]
-
-    # check mismatch with sample names in inputs
-    unknown_ids = [elem for elem in sample_names if elem not in files.keys()]
-
-    if sample_names == ["all"]:
-        sample_names = files.keys()
-    elif unknown_ids:
-        error_msg = ", ".join(unknown_ids)
-        raise ValueError(f"Unable to find relevant data for {error_msg}")
-
-    res_df = pd.DataFrame()
-    for sample_id in sample_names:
-        file_name = files[sample_id]
-
-        data = pd.read_csv(load_path / file_name)
-        data_shape = data["ID"].shape
-        print(
-            f"Loaded data file for sample {sample_id} which has flux matrix of {data_shape}"
-        )
-
-        df = pd.merge(
-            left=data.drop("Unnamed: 0", axis=1),
-            right=id_df[["ID", "BiGG ID"]],
-            how="left",
-            on="ID",
-        )
-
-        df = df.assign(author="Chassagnole", sample_id=sample_id)
-        df = df.rename({"BiGG ID": "BiGG_ID", "Value": "flux"}, axis=1)
-
-        # Calculate normalized fluxes
-        glucose_uptake = df[df["ID"] == "vPTS"]["flux"].values[0]
-        df = df.assign(normalized_flux=lambda x: x.flux * 100 / glucose_uptake)
-
-        # update
-        res_df = pd.concat([res_df, df])
-
-    return res_df
+    return _load_reaction_rates(
+        "Chassagnole",
+        get_chassagnole_rules(),
+        sample_names,
+        load_path,
+        id_df,
+        files,
+        cache,
+        workers,
+    )
+
+
+def iter_chassagnole(sample_names, load_path, id_df, files=None, cache=None):
+    """
+    Same as load_chassagnole, but parses one file at a time
+    and yields (author, sample_id, dataframe of the sample),
+    the flux vector is its flux column with reactions in the order of the ID column
+    """
+    return _iter_reaction_rates(
+        "Chassagnole",
+        get_chassagnole_rules(),
+        sample_names,
+        load_path,
+        id_df,
+        files,
+        cache,
+    )